@@ -0,0 +1,58 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# geocode comparison: python benchmarks/geocode.py [--rows N] [--distinct N]
+# times get_countries (one query for the distinct pairs) against a query per row, as the old get_country did,
+# and exits non-zero when the two disagree on any row
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import pandas as pd
+from constants import Cols
+from core.geocache import load_rgeocoder
+from core.pipelines import get_countries
+
+def make_frame(rows: int, distinct: int, seed: int = 0) -> pd.DataFrame:
+    # photos cluster on a few thousand locations, some have no coordinates
+    rng = random.Random(seed)
+    locations = [(rng.uniform(-60.0, 70.0), rng.uniform(-180.0, 180.0)) for _ in range(distinct)]
+    coords = [rng.choice(locations) if rng.random() > 0.1 else (None, None) for _ in range(rows)]
+    return pd.DataFrame(coords, columns=[Cols.EXIF_GPS_LATITUDE, Cols.EXIF_GPS_LONGITUDE])
+
+def get_country_per_row(row: pd.Series, geocoder) -> str | None:
+    lat, lon = row[Cols.EXIF_GPS_LATITUDE], row[Cols.EXIF_GPS_LONGITUDE]
+    if pd.isna(lat) or pd.isna(lon):
+        return None
+    return geocoder.query([(lat, lon)])[0]["cc"]
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--distinct", type=int, default=3_000)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.distinct)
+    # the KD-tree is built up front so neither side pays for it
+    geocoder = load_rgeocoder(mode=1, verbose=False)
+    row_seconds, per_row = timed(lambda: df.apply(get_country_per_row, axis=1, geocoder=geocoder))
+    batch_seconds, batched = timed(lambda: get_countries(df, geocoder))
+
+    print(f"{args.rows} rows, {args.distinct} distinct locations")
+    print(f"per row: {row_seconds:.3f}s")
+    print(f"batched: {batch_seconds:.3f}s ({row_seconds / batch_seconds:.0f}x)")
+    same = per_row.astype(object).where(per_row.notna(), None).tolist() == batched.tolist()
+    if not same:
+        print("batched lookup returned other countries than the per row lookup")
+    return 0 if same else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
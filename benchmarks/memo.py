@@ -0,0 +1,60 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# memo check: python benchmarks/memo.py [--rows N] [--distinct N]
+# runs the date parsing step twice against the same memo file, each run with fresh objects as a new process would have,
+# and exits non-zero when the second run sends any row to the parser again
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import pandas as pd
+from core.transformation import DateParser
+from dataframe.col_filter import NameFilter
+from dataframe.context import Context
+from dataframe.memo import MemoStore
+from dataframe.pipeline import Compute, Pipeline
+from dataframe.processor import ElementProcessor
+
+DATE_COLS = ["EXIF:DateTimeOriginal", "File:FileModifyDate"]
+
+def make_frame(rows: int, distinct: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    dates = [f"20{rng.randrange(10, 25)}:{rng.randrange(1, 13):02d}:{rng.randrange(1, 29):02d} {rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}" for _ in range(distinct)]
+    return pd.DataFrame({col: [rng.choice(dates) for _ in range(rows)] for col in DATE_COLS})
+
+def run(df: pd.DataFrame, memo_path: str) -> dict:
+    # same step as EarliestYear's date parsing, a parser without a path so only the memo carries over
+    memo = MemoStore(path=memo_path)
+    memo.load()
+    ctx = Context(parser_factory=DateParser, memo=memo)
+    pipeline = Pipeline([Compute(ElementProcessor(ctx.parser.parse), NameFilter(DATE_COLS), memo=True)], context=ctx)
+    start = time.perf_counter()
+    out = pipeline.execute(df.copy())
+    elapsed = time.perf_counter() - start
+    memo.save()
+    return {"seconds": elapsed, "computed": memo.misses, "reused": memo.hits, "out": out}
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--distinct", type=int, default=3_000)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.distinct)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        memo_path = os.path.join(tmp_dir, "memo.json")
+        first, second = run(df, memo_path), run(df, memo_path)
+    for name, result in (("first run", first), ("second run", second)):
+        print(f"{name}: {result['seconds']:.3f}s, {result['computed']} rows computed, {result['reused']} reused")
+    same = first["out"].equals(second["out"])
+    if not same:
+        print("second run returned other values than the first")
+    return 0 if second["computed"] == 0 and same else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
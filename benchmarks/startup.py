@@ -0,0 +1,45 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# startup guard: python benchmarks/startup.py [--runs N] [--budget SECONDS]
+# exits non-zero when importing main gets slower than the budget or pulls in a module that should load lazily
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIN_PYTHON = (3, 12)    # main nests quotes inside f-strings, older interpreters fail on the import with a SyntaxError
+DEFERRED = ["reverse_geocoder", "scipy", "tqdm", "exiftool", "dotenv"]
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {DEFERRED!r} if name in sys.modules]}}))
+"""
+
+def measure() -> dict:
+    # a fresh interpreter per run, nothing is imported from a previous one
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if sys.version_info < MIN_PYTHON:
+        print(f"main needs Python {'.'.join(map(str, MIN_PYTHON))} or later, this is {sys.version.split()[0]}")
+        return 2
+    runs = [measure() for _ in range(args.runs)]
+    median = statistics.median(run["seconds"] for run in runs)
+    loaded = sorted({name for run in runs for name in run["loaded"]})
+    print(f"import main: median {median:.3f}s over {args.runs} runs (budget {args.budget:.3f}s)")
+    if loaded:
+        print(f"loaded at import, expected lazily: {loaded}")
+    return 0 if median <= args.budget and not loaded else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,7 +22,10 @@ class Cols:
     INODE = "Inode"
     FILE_ID = "CacheKey"
     EXIF_ARGS = "ExifArgs"
+    SEEN_AT = "SeenAt"
     FILE_HASH = "FileHash"
+    PARTIAL_HASH = "PartialHash"
+    INDEXED_PATH = "IndexedPath"
 
     # EXIF COLUMNS
     FILE_TYPE_EXT = "File:FileTypeExtension"
@@ -0,0 +1,695 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+from constants import Cols
+from core.journal import Journal, fsync_file
+from dataclasses import dataclass, field
+from dataframe.write import JSONWriter
+from dataframe.load import JSONLoader
+import hashlib
+import json
+import os
+import pandas as pd
+import sqlite3
+import sys
+import threading
+from typing import Iterable, Iterator
+
+SQLITE_MAX_VARS = 500
+
+def frame_to_records(df: pd.DataFrame) -> dict[str, dict]:
+    # to_json handles numpy scalars and NaN in C, nulls are dropped so rows stay sparse
+    records = json.loads(df.to_json(orient="index", force_ascii=False))
+    return {key: {col: value for col, value in row.items() if value is not None} for key, row in records.items()}
+
+def records_to_frame(records: dict[str, dict], columns: list[str] | None = None) -> pd.DataFrame:
+    # only requested columns are materialised into the dense frame
+    if columns is not None:
+        records = {key: {col: record[col] for col in columns if col in record} for key, record in records.items()}
+    df = pd.DataFrame.from_dict(records, orient="index").reindex(index=list(records)) if records else pd.DataFrame()
+    return df if columns is None else df.reindex(columns=columns)
+
+def iter_chunks(items: list, size: int) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+class Cache(ABC):
+
+    @property
+    @abstractmethod
+    def columns(self) -> list[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def load(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, keys: Iterable[str] | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, new_entries: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, changed_entries: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def clone(self, src_to_dest: dict) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, entry_ids: list) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, dropna: bool = False) -> None:
+        raise NotImplementedError
+
+@dataclass
+class FileCache(Cache):
+    # JSON snapshot, optionally followed by a journal of the mutations made since it was written
+    path: str
+    loader: JSONLoader
+    writer: JSONWriter
+    journal: Journal | None = None
+    compactor: threading.Thread | None = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._write_snapshot(self._empty(), self.path, dropna=False)
+
+    def _require_loaded(self) -> None:
+        if self.data is None:
+            raise ValueError("Cache not loaded")
+
+    def _require_data(self) -> None:
+        self._require_loaded()
+        if self._is_empty():
+            raise ValueError("Cache is empty")
+
+    def _require_keys(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        present = set(self._contains(keys))
+        missing = [key for key in keys if key not in present]
+        if missing:
+            raise KeyError(f"Entries not in cache: {missing}")
+
+    @abstractmethod
+    def _empty(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _is_empty(self) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _contains(self, keys: Iterable[str]) -> list[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _read_snapshot(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _write_snapshot(self, data, path: str, dropna: bool) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _snapshot(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _add(self, new_entries: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _update(self, changed_entries: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _upsert(self, records: dict[str, dict], partial: bool) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _copy(self, src_to_dest: dict) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _remove(self, entry_ids: list) -> None:
+        raise NotImplementedError
+
+    def _reset(self) -> None:
+        self.data = self._empty()
+
+    def _log(self, op: str, payload) -> None:
+        if self.journal is not None:
+            self.journal.open()
+            self.journal.append(op, payload)
+
+    def _apply(self, op: str, payload) -> None:
+        # replay is idempotent, so ops already folded into the snapshot by an interrupted compaction are harmless
+        match op:
+            case "clear":
+                self._reset()
+            case "add" | "update":
+                self._upsert(payload, partial=op == "update")
+            case "clone":
+                present = set(self._contains(payload))
+                self._remove(list(payload.values()))
+                self._copy({src: dest for src, dest in payload.items() if src in present})
+            case "delete":
+                self._remove(payload)
+
+    def load(self) -> None:
+        self._wait_compaction()
+        self._read_snapshot()
+        if self.journal is not None:
+            self.journal.close()
+            for op, payload in self.journal.replay():
+                self._apply(op, payload)
+            if os.path.exists(self.journal.rotated_path):
+                self.compact(background=False)
+            self.journal.open()
+
+    def clear(self) -> None:
+        self._wait_compaction()
+        self._reset()
+        self._log("clear", None)
+
+    def add(self, new_entries: pd.DataFrame) -> None:
+        self._require_loaded()
+        if self._contains(new_entries.index):
+            raise ValueError(f"New entries overlap with existing")
+        if self.journal is not None:
+            self._log("add", frame_to_records(new_entries))
+        self._add(new_entries)
+
+    def update(self, changed_entries: pd.DataFrame) -> None:
+        self._require_data()
+        self._require_keys(changed_entries.index)
+        if self.journal is not None:
+            # nulls are kept, an update to null clears the value
+            self._log("update", json.loads(changed_entries.to_json(orient="index", force_ascii=False)))
+        self._update(changed_entries)
+
+    def clone(self, src_to_dest: dict) -> None:
+        self._require_data()
+        self._require_keys(src_to_dest)
+        if self._contains(src_to_dest.values()):
+            raise ValueError(f"New entries overlap with existing")
+        self._log("clone", src_to_dest)
+        self._copy(src_to_dest)
+
+    def delete(self, entry_ids: list) -> None:
+        self._require_data()
+        entry_ids = list(entry_ids)
+        self._log("delete", entry_ids)
+        self._remove(entry_ids)
+
+    def save(self, dropna: bool = False) -> None:
+        # with a journal a save is a checkpoint, the full snapshot is only rewritten on compaction
+        self._require_loaded()
+        if self.journal is None:
+            self._write_snapshot(self.data, self.path, dropna=dropna)
+            return
+        self.journal.checkpoint()
+        if self.journal.needs_compaction():
+            self.compact(dropna=dropna)
+
+    def compact(self, dropna: bool = False, background: bool = True) -> None:
+        self._require_loaded()
+        self._wait_compaction()
+        snapshot = self._snapshot()
+
+        def write_snapshot() -> None:
+            tmp_path = f"{self.path}.tmp"
+            self._write_snapshot(snapshot, tmp_path, dropna=dropna)
+            fsync_file(tmp_path)
+            os.replace(tmp_path, self.path)
+
+        if self.journal is None:
+            write_snapshot()
+            return
+
+        if os.path.exists(self.journal.rotated_path):
+            # leftover of an interrupted compaction, both journals are folded in before anything is removed
+            write_snapshot()
+            self.journal.truncate()
+            return
+
+        self.journal.checkpoint()
+        self.journal.rotate()
+
+        def run() -> None:
+            write_snapshot()
+            self.journal.discard_rotated()
+
+        if background:
+            self.compactor = threading.Thread(target=run)
+            self.compactor.start()
+        else:
+            run()
+
+    def _wait_compaction(self) -> None:
+        if self.compactor is not None:
+            self.compactor.join()
+            self.compactor = None
+
+def assign_values(df: pd.DataFrame, values: pd.DataFrame) -> None:
+    # label-aligned write that widens a column to object instead of failing on a lossy setitem
+    for col in values.columns:
+        if col not in df.columns:
+            df[col] = pd.Series(None, index=df.index, dtype=object)
+        try:
+            df.loc[values.index, col] = values[col]
+        except TypeError:
+            df[col] = df[col].astype(object)
+            df.loc[values.index, col] = values[col]
+
+@dataclass
+class JSONCache(FileCache):
+    # mutations are collected as row dicts and merged into the base frame at once on save or on the first read
+    data: pd.DataFrame = None
+    pending: dict[str, dict] = field(default_factory=dict, repr=False)
+    fresh: set[str] = field(default_factory=set, repr=False)
+    removed: set[str] = field(default_factory=set, repr=False)
+
+    def _in_base(self, key: str) -> bool:
+        return key in self.data.index and key not in self.removed
+
+    def _row(self, key: str) -> dict:
+        if key in self.fresh:
+            return dict(self.pending[key])
+        return {**self.data.loc[key].to_dict(), **self.pending.get(key, {})}
+
+    def _merge(self) -> None:
+        if not (self.pending or self.removed):
+            return
+        patches = {key: patch for key, patch in self.pending.items() if key not in self.fresh}
+        dropped = self.removed | set(self.data.index.intersection(list(self.fresh)))
+        data = self.data.drop(index=list(dropped), errors="ignore") if dropped else self.data
+        # one aligned write per distinct set of patched columns, usually a single one
+        groups = {}
+        for key, patch in patches.items():
+            groups.setdefault(tuple(patch), {})[key] = patch
+        for patch_group in groups.values():
+            assign_values(data, pd.DataFrame.from_dict(patch_group, orient="index"))
+        if self.fresh:
+            rows = records_to_frame({key: self.pending[key] for key in self.pending if key in self.fresh})
+            data = pd.concat([data, rows])
+        self.data = data
+        self.pending, self.fresh, self.removed = {}, set(), set()
+
+    @property
+    def columns(self) -> list[str]:
+        self._require_loaded()
+        self._merge()
+        return self.data.columns.to_list()
+
+    def get(self, keys: Iterable[str] | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        self._require_loaded()
+        self._merge()
+        data = self.data if keys is None else self.data.loc[self.data.index.intersection(keys)]
+        return data if columns is None else data.reindex(columns=columns)
+
+    def save(self, dropna: bool = False) -> None:
+        self._require_loaded()
+        self._merge()
+        super().save(dropna=dropna)
+
+    def _empty(self) -> pd.DataFrame:
+        return pd.DataFrame()
+
+    def _reset(self) -> None:
+        self.data = self._empty()
+        self.pending, self.fresh, self.removed = {}, set(), set()
+
+    def _is_empty(self) -> bool:
+        return len(self.data.index) == len(self.removed) and not self.fresh
+
+    def _contains(self, keys: Iterable[str]) -> list[str]:
+        return [key for key in keys if key in self.fresh or self._in_base(key)]
+
+    def _read_snapshot(self) -> None:
+        self._reset()
+        self.data = self.loader.load(self.path)
+
+    def _write_snapshot(self, data: pd.DataFrame, path: str, dropna: bool) -> None:
+        self.writer.save(data, path, dropna=dropna)
+
+    def _snapshot(self) -> pd.DataFrame:
+        self._merge()
+        return self.data.copy()
+
+    def _add(self, new_entries: pd.DataFrame) -> None:
+        for key, row in new_entries.to_dict(orient="index").items():
+            self.pending[key] = row
+            self.fresh.add(key)
+
+    def _update(self, changed_entries: pd.DataFrame) -> None:
+        for key, changes in changed_entries.to_dict(orient="index").items():
+            self.pending[key] = {**self.pending.get(key, {}), **changes}
+
+    def _upsert(self, records: dict[str, dict], partial: bool) -> None:
+        entries = records_to_frame(records)
+        if partial:
+            entries = entries.loc[[key for key in entries.index if key in self.fresh or self._in_base(key)]]
+            self._update(entries)
+        else:
+            self._remove(entries.index)
+            self._add(entries)
+
+    def _copy(self, src_to_dest: dict) -> None:
+        for src, dest in src_to_dest.items():
+            self.pending[dest] = self._row(src)
+            self.fresh.add(dest)
+
+    def _remove(self, entry_ids: list) -> None:
+        for key in entry_ids:
+            self.pending.pop(key, None)
+            self.fresh.discard(key)
+            if key in self.data.index:
+                self.removed.add(key)
+
+@dataclass
+class SparseJSONCache(FileCache):
+    # key -> {tag: value} without nulls, tag names are interned so every entry shares one key table
+    data: dict[str, dict] = None
+    tag_counts: Counter = field(default_factory=Counter, repr=False)
+
+    def _put(self, key: str, record: dict) -> None:
+        self._drop(key)
+        record = {sys.intern(tag): value for tag, value in record.items()}
+        self.tag_counts.update(record.keys())
+        self.data[key] = record
+
+    def _drop(self, key: str) -> None:
+        record = self.data.pop(key, None)
+        if record:
+            self.tag_counts.subtract(record.keys())
+
+    @property
+    def columns(self) -> list[str]:
+        self._require_loaded()
+        return [tag for tag, count in self.tag_counts.items() if count > 0]
+
+    def get(self, keys: Iterable[str] | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        self._require_loaded()
+        keys = self.data.keys() if keys is None else [key for key in dict.fromkeys(keys) if key in self.data]
+        return records_to_frame({key: self._record(key) for key in keys}, columns)
+
+    def _record(self, key: str) -> dict:
+        return self.data[key]
+
+    def _empty(self) -> dict:
+        return {}
+
+    def _reset(self) -> None:
+        self.data, self.tag_counts = {}, Counter()
+
+    def _is_empty(self) -> bool:
+        return not self.data
+
+    def _contains(self, keys: Iterable[str]) -> list[str]:
+        return [key for key in keys if key in self.data]
+
+    def _read_snapshot(self) -> None:
+        self._reset()
+        for key, record in self.loader.load_records(self.path).items():
+            self._put(key, record)
+
+    def _write_snapshot(self, data: dict, path: str, dropna: bool) -> None:
+        self.writer.save_records(data, path)
+
+    def _snapshot(self) -> dict:
+        # records are replaced, never mutated in place, so a shallow copy is a consistent snapshot
+        return dict(self.data)
+
+    def _add(self, new_entries: pd.DataFrame) -> None:
+        self._upsert(frame_to_records(new_entries), partial=False)
+
+    def _update(self, changed_entries: pd.DataFrame) -> None:
+        self._upsert(json.loads(changed_entries.to_json(orient="index", force_ascii=False)), partial=True)
+
+    def _upsert(self, records: dict[str, dict], partial: bool) -> None:
+        for key, changes in records.items():
+            if not partial:
+                self._put(key, changes)
+                continue
+            if key not in self.data:
+                continue
+            record = dict(self._record(key))
+            for tag, value in changes.items():
+                if value is None:
+                    record.pop(tag, None)
+                else:
+                    record[tag] = value
+            self._put(key, record)
+
+    def _copy(self, src_to_dest: dict) -> None:
+        for src, dest in src_to_dest.items():
+            self._put(dest, self._record(src))
+
+    def _remove(self, entry_ids: list) -> None:
+        for key in entry_ids:
+            self._drop(key)
+
+def content_id(record: dict) -> str:
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+BLOBS_KEY, REFS_KEY, LOCAL_KEY = "__blobs__", "__refs__", "__local__"
+
+@dataclass
+class ContentJSONCache(SparseJSONCache):
+    # key -> (content id, path dependent tags), every copy of the same content points to one shared record
+    # the shared record is everything outside local_groups and local_tags, so it only depends on the file content and the exif args
+    local_groups: tuple[str, ...] = ("File:",)
+    local_tags: tuple[str, ...] = (Cols.FILE_PATH,)
+    blobs: dict[str, dict] = field(default_factory=dict, repr=False)
+    blob_refs: Counter = field(default_factory=Counter, repr=False)
+
+    def _link(self, key: str, cid: str, local: dict) -> None:
+        self.data[key] = (cid, local)
+        self.blob_refs[cid] += 1
+        self.tag_counts.update(self.blobs[cid].keys())
+        self.tag_counts.update(local.keys())
+
+    def _is_local(self, tag: str) -> bool:
+        return tag in self.local_tags or tag.startswith(self.local_groups)
+
+    def _put(self, key: str, record: dict) -> None:
+        self._drop(key)
+        shared, local = {}, {}
+        for tag, value in record.items():
+            tag = sys.intern(tag)
+            if self._is_local(tag):
+                local[tag] = value
+            else:
+                shared[tag] = value
+        cid = content_id(shared)
+        self.blobs.setdefault(cid, shared)
+        self._link(key, cid, local)
+
+    def _drop(self, key: str) -> None:
+        entry = self.data.pop(key, None)
+        if entry is None:
+            return
+        cid, local = entry
+        self.tag_counts.subtract(self.blobs[cid].keys())
+        self.tag_counts.subtract(local.keys())
+        self.blob_refs[cid] -= 1
+        if self.blob_refs[cid] <= 0:
+            del self.blobs[cid], self.blob_refs[cid]
+
+    def _record(self, key: str) -> dict:
+        cid, local = self.data[key]
+        return {**self.blobs[cid], **local}
+
+    def _reset(self) -> None:
+        super()._reset()
+        self.blobs, self.blob_refs = {}, Counter()
+
+    def _read_snapshot(self) -> None:
+        self._reset()
+        records = self.loader.load_records(self.path)
+        if BLOBS_KEY not in records:
+            # flat snapshot written by SparseJSONCache, entries are split and deduplicated as they are read
+            for key, record in records.items():
+                self._put(key, record)
+            return
+        blobs, local = records[BLOBS_KEY], records[LOCAL_KEY]
+        if any(self._is_local(tag) for blob in blobs.values() for tag in blob):
+            # written before these tags were local, entries are split again so copies share their blob
+            for key, cid in records[REFS_KEY].items():
+                self._put(key, {**blobs[cid], **local.get(key, {})})
+            return
+        for cid, blob in blobs.items():
+            self.blobs[cid] = {sys.intern(tag): value for tag, value in blob.items()}
+        for key, cid in records[REFS_KEY].items():
+            self._link(key, cid, {sys.intern(tag): value for tag, value in local.get(key, {}).items()})
+
+    def _snapshot(self) -> dict:
+        # shared and local records are replaced, never mutated in place
+        return {
+            BLOBS_KEY: dict(self.blobs),
+            REFS_KEY: {key: cid for key, (cid, _) in self.data.items()},
+            LOCAL_KEY: {key: local for key, (_, local) in self.data.items() if local},
+        }
+
+    def save(self, dropna: bool = False) -> None:
+        # the entries only hold references, the snapshot layout is written whether or not there is a journal
+        if self.journal is None:
+            self._require_loaded()
+            self._write_snapshot(self._snapshot(), self.path, dropna=dropna)
+            return
+        super().save(dropna=dropna)
+
+    def _empty(self) -> dict:
+        return {BLOBS_KEY: {}, REFS_KEY: {}, LOCAL_KEY: {}}
+
+    def _copy(self, src_to_dest: dict) -> None:
+        # copies and moves only add a reference, the shared record is not duplicated
+        for src, dest in src_to_dest.items():
+            cid, local = self.data[src]
+            self._drop(dest)
+            self._link(dest, cid, dict(local))
+
+@dataclass
+class SQLiteCache(Cache):
+    # one row per CacheKey, the entry itself is a JSON object without nulls
+    path: str
+    table: str = "entries"
+    conn: sqlite3.Connection = field(default=None, repr=False)
+    changed: dict[str, dict] = field(default_factory=dict, repr=False)
+    deleted: set[str] = field(default_factory=set, repr=False)
+    cleared: bool = False
+    known_columns: dict[str, bool] = field(default_factory=dict, repr=False)
+
+    def _require_loaded(self) -> None:
+        if self.conn is None:
+            raise ValueError("Cache not loaded")
+
+    def _track_columns(self, records: Iterable[dict]) -> None:
+        # column names seen so far, False marks the ones not yet persisted
+        for record in records:
+            for col in record:
+                self.known_columns.setdefault(col, False)
+
+    @property
+    def columns(self) -> list[str]:
+        self._require_loaded()
+        return list(self.known_columns)
+
+    def _fetch(self, keys: list[str]) -> dict[str, dict]:
+        # point queries against the primary key index, pending changes take precedence
+        records = {}
+        stored = [key for key in keys if key not in self.changed and key not in self.deleted]
+        if stored and not self.cleared:
+            for chunk in iter_chunks(stored, SQLITE_MAX_VARS):
+                placeholders = ",".join("?" * len(chunk))
+                query = f"SELECT key, data FROM {self.table} WHERE key IN ({placeholders})"
+                records.update((key, json.loads(data)) for key, data in self.conn.execute(query, chunk))
+        records.update((key, self.changed[key]) for key in keys if key in self.changed)
+        return records
+
+    def _fetch_all(self) -> dict[str, dict]:
+        records = {}
+        if not self.cleared:
+            records = {key: json.loads(data) for key, data in self.conn.execute(f"SELECT key, data FROM {self.table}") if key not in self.deleted}
+        records.update(self.changed)
+        return records
+
+    def load(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table}_columns (name TEXT PRIMARY KEY) WITHOUT ROWID")
+        self.changed, self.deleted, self.cleared = {}, set(), False
+        self.known_columns = {name: True for name, in self.conn.execute(f"SELECT name FROM {self.table}_columns")}
+
+    def clear(self) -> None:
+        if self.conn is None:
+            self.load()
+        self.changed, self.deleted, self.cleared = {}, set(), True
+        self.known_columns = {}
+
+    def get(self, keys: Iterable[str] | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        self._require_loaded()
+        if keys is None:
+            return records_to_frame(self._fetch_all(), columns)
+        keys = [key for key in dict.fromkeys(keys) if isinstance(key, str)]
+        return records_to_frame(self._fetch(keys), columns)
+
+    def _insert(self, records: dict[str, dict]) -> None:
+        if self._fetch(list(records)):
+            raise ValueError(f"New entries overlap with existing")
+        for key, record in records.items():
+            self.deleted.discard(key)
+            self.changed[key] = record
+        self._track_columns(records.values())
+
+    def add(self, new_entries: pd.DataFrame) -> None:
+        self._require_loaded()
+        self._insert(frame_to_records(new_entries))
+
+    def _require_keys(self, keys: Iterable[str]) -> dict[str, dict]:
+        # all keys are checked before anything is changed, the current records are returned
+        keys = list(keys)
+        current = self._fetch(keys)
+        missing = [key for key in keys if key not in current]
+        if missing:
+            raise KeyError(f"Entries not in cache: {missing}")
+        return current
+
+    def update(self, changed_entries: pd.DataFrame) -> None:
+        self._require_loaded()
+        current = self._require_keys(changed_entries.index)
+        records = {}
+        for key, changes in zip(changed_entries.index, json.loads(changed_entries.to_json(orient="values", force_ascii=False))):
+            record = dict(current[key])
+            for col, value in zip(changed_entries.columns, changes):
+                if value is None:
+                    record.pop(col, None)
+                else:
+                    record[col] = value
+            records[key] = record
+        self.changed.update(records)
+        self._track_columns(records.values())
+
+    def clone(self, src_to_dest: dict) -> None:
+        self._require_loaded()
+        current = self._require_keys(src_to_dest)
+        self._insert({dest: dict(current[src]) for src, dest in src_to_dest.items()})
+
+    def delete(self, entry_ids: list) -> None:
+        self._require_loaded()
+        for key in entry_ids:
+            self.changed.pop(key, None)
+            self.deleted.add(key)
+
+    def save(self, dropna: bool = False) -> None:
+        # only the rows touched since load are written, in a single transaction
+        self._require_loaded()
+        with self.conn:
+            if self.cleared:
+                self.conn.execute(f"DELETE FROM {self.table}")
+                self.conn.execute(f"DELETE FROM {self.table}_columns")
+            self.conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", ((key,) for key in self.deleted))
+            self.conn.executemany(
+                f"INSERT INTO {self.table} (key, data) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET data = excluded.data",
+                ((key, json.dumps(record, ensure_ascii=False)) for key, record in self.changed.items())
+            )
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table}_columns (name) VALUES (?)",
+                ((col,) for col, persisted in self.known_columns.items() if not persisted)
+            )
+        self.changed, self.deleted, self.cleared = {}, set(), False
+        self.known_columns = dict.fromkeys(self.known_columns, True)
@@ -1,70 +1,22 @@
+from core.cache import Cache
+from core.fileops import FileOpExecutor
+from core.index import ContentIndex
+from core.scheduler import IOScheduler
 from dataclasses import dataclass, field
 from dataframe.context import Context
-from dataframe.write import JSONWriter
 from dataframe.load import JSONLoader
 from dataframe.predicate import Predicate, Condition, And, Or, AllRows
-from exiftool import ExifTool
 import json
-import os
 import pandas as pd
-from typing import Iterator
+import queue
+import threading
+from typing import Callable, Iterator
 
 def get_batches(files: list[str], batch_size: int) -> list[list[str]]:
     if batch_size <= 0:
         return [files]
     return [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
 
-@dataclass
-class Cache:
-    path: str
-    loader: JSONLoader
-    writer: JSONWriter
-    data: pd.DataFrame = None
-
-    def __post_init__(self):
-        if not os.path.exists(self.path):
-            os.makedirs(os.path.dirname(self.path), exist_ok=True)
-            self.writer.save(pd.DataFrame(), self.path)
-
-    def _require_loaded(self) -> None:
-        if self.data is None:
-            raise ValueError("Cache not loaded")
-
-    def _require_data(self) -> None:
-        self._require_loaded()
-        if self.data.empty:
-            raise ValueError("Cache is empty")
-
-    def load(self) -> pd.DataFrame:
-        self.data = self.loader.load(self.path)
-
-    def clear(self) -> pd.DataFrame:
-        self.data = pd.DataFrame()
-
-    def add(self, new_entries: pd.DataFrame) -> None:
-        self._require_loaded()
-        overlap = new_entries.index.intersection(self.data.index)
-        if not overlap.empty:
-            raise ValueError(f"New entries overlap with existing")
-        self.data = pd.concat([self.data, new_entries])
-
-    def update(self, changed_entries: pd.DataFrame):
-        self._require_data()
-        self.data.loc[changed_entries.index, changed_entries.columns] = changed_entries
-
-    def clone(self, src_to_dest: dict) -> None:
-        self._require_data()
-        cloned = self.data.loc[list(src_to_dest.keys())].rename(index=src_to_dest)
-        self.add(cloned)
-
-    def delete(self, entry_ids: list) -> None:
-        self._require_data()
-        self.data = self.data.drop(index=entry_ids, errors="ignore")
-
-    def save(self, dropna: bool = False) -> None:
-        self._require_loaded()
-        self.writer.save(self.data, self.path, dropna=dropna)
-
 @dataclass
 class Reference:
     path: str
@@ -75,16 +27,54 @@ class Reference:
 
 @dataclass
 class Exif:
-    path: str
+    path: str | Callable[[], str]           # or a function locating the executable, only called once files need extracting
     batch_size: int
     args: list[str] = field(default_factory=list)
+    scheduler: IOScheduler | None = None
+
+    @property
+    def executable(self) -> str:
+        if callable(self.path):
+            self.path = self.path()
+        return self.path
 
-    def extract(self, files: list[str]) -> Iterator[dict]:
-        with ExifTool(encoding="utf-8", executable=self.path) as et:
+    def _extract_batches(self, files: list[str], executable: str) -> Iterator[dict]:
+        from exiftool import ExifTool
+
+        with ExifTool(encoding="utf-8", executable=executable) as et:
             for batch in get_batches(files, self.batch_size):
                 raw_output = et.execute(*self.args, *batch)
                 yield from json.loads(raw_output)
 
+    def extract(self, files: list[str], devs: list | None = None, inos: list | None = None) -> Iterator[dict]:
+        # located before any thread starts, the drain threads would otherwise race to resolve it
+        executable = self.executable
+        if self.scheduler is None:
+            yield from self._extract_batches(files, executable)
+            return
+
+        # one exiftool process per device queue, records are yielded as they arrive
+        queues = self.scheduler.plan(files, devs, inos)
+        records = queue.Queue()
+        done = object()
+
+        def drain(positions: list[int]) -> None:
+            try:
+                for record in self._extract_batches([files[pos] for pos in positions], executable):
+                    records.put(record)
+            except Exception as e:
+                records.put(e)
+
+        def run() -> None:
+            self.scheduler.run(drain, queues)
+            records.put(done)
+
+        threading.Thread(target=run, daemon=True).start()
+        while (record := records.get()) is not done:
+            if isinstance(record, Exception):
+                raise record
+            yield record
+
 @dataclass
 class Config:
     register: Cache
@@ -92,4 +82,6 @@ class Config:
     ref: Reference
     exif: Exif
     context: Context
+    index: ContentIndex | None = None
+    fileops: FileOpExecutor = field(default_factory=FileOpExecutor)
     # filter: Predicate
\ No newline at end of file
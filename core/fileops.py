@@ -0,0 +1,149 @@
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from core.scheduler import UNKNOWN_DEV
+from core.transformation import copy_with_hash
+from dataclasses import dataclass
+import errno
+import os
+import pandas as pd
+from typing import Callable, Iterable
+
+def known_hash(file_hash) -> str | None:
+    return file_hash if isinstance(file_hash, str) and file_hash else None
+
+def move(src_path: str, dest_path: str, file_hash: str | None = None, verify: bool = False) -> tuple[Exception | None, str | None]:
+    file_hash = known_hash(file_hash)
+    try:
+        if os.path.exists(dest_path):
+            raise RuntimeError("Destination occupied")
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        try:
+            os.rename(src_path, dest_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # crossing devices, stream the data once and hash it on the way
+            file_hash = copy_with_hash(src_path, dest_path, expected_hash=file_hash, verify=verify)
+            try:
+                os.remove(src_path)
+            except OSError:
+                # the source could not be removed, drop the copy so the file is not in both places
+                os.remove(dest_path)
+                raise
+        if os.path.exists(src_path):
+            raise RuntimeError("Source still exists")
+        return None, file_hash
+    except Exception as e:
+        return e, file_hash
+
+def copy(src_path: str, dest_path: str, file_hash: str | None = None, verify: bool = False) -> tuple[Exception | None, str | None]:
+    file_hash = known_hash(file_hash)
+    try:
+        if os.path.exists(dest_path):
+            raise RuntimeError("Destination occupied")
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        file_hash = copy_with_hash(src_path, dest_path, expected_hash=file_hash, verify=verify)
+        return None, file_hash
+    except Exception as e:
+        return e, file_hash
+
+def interleave_sizes(positions: list[int], sizes: list) -> list[int]:
+    # largest, smallest, second largest, second smallest... so long copies overlap with many short ones
+    ordered = sorted(positions, key=lambda pos: -1 if pd.isna(sizes[pos]) else sizes[pos], reverse=True)
+    out = []
+    left, right = 0, len(ordered) - 1
+    while left <= right:
+        out.append(ordered[left])
+        if left != right:
+            out.append(ordered[right])
+        left, right = left + 1, right - 1
+    return out
+
+@dataclass
+class FileOpExecutor:
+    # runs copy/move operations on a thread pool, at most per_src_device reads and per_dest_device writes per device at once
+    max_workers: int = 8
+    per_src_device: int = 2
+    per_dest_device: int = 2
+
+    def __post_init__(self):
+        # with a limit below one nothing is ever submitted and run would wait forever
+        for name in ("max_workers", "per_src_device", "per_dest_device"):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be at least 1")
+
+    def _src_device(self, path: str, dev) -> int:
+        if not pd.isna(dev):
+            return int(dev)
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            return UNKNOWN_DEV
+
+    def _dest_device(self, path: str, devs_by_dir: dict[str, int]) -> int:
+        # destination directories may not exist yet, they are on the device of their closest existing parent
+        dir_path = os.path.dirname(os.path.abspath(path))
+        if dir_path not in devs_by_dir:
+            parent = dir_path
+            while not os.path.exists(parent) and os.path.dirname(parent) != parent:
+                parent = os.path.dirname(parent)
+            try:
+                devs_by_dir[dir_path] = os.stat(parent).st_dev
+            except OSError:
+                devs_by_dir[dir_path] = UNKNOWN_DEV
+        return devs_by_dir[dir_path]
+
+    def plan(self, srcs: list[str], dests: list[str], src_devs: Iterable | None = None, sizes: Iterable | None = None) -> dict[tuple[int, int], deque]:
+        # (source device, destination device) -> positions, large and small files interleaved
+        src_devs = list(src_devs) if src_devs is not None else [None] * len(srcs)
+        sizes = list(sizes) if sizes is not None else [None] * len(srcs)
+        devs_by_dir = {}
+        groups = {}
+        for pos, (src, dest, dev) in enumerate(zip(srcs, dests, src_devs)):
+            key = (self._src_device(src, dev), self._dest_device(dest, devs_by_dir))
+            groups.setdefault(key, []).append(pos)
+        return {key: deque(interleave_sizes(positions, sizes)) for key, positions in groups.items()}
+
+    def run(self, operation: Callable, srcs: list[str], dests: list[str], file_hashes: Iterable | None = None, src_devs: Iterable | None = None, sizes: Iterable | None = None, progress: Callable[[int], None] | None = None, **kwargs) -> list[tuple[Exception | None, str | None]]:
+        # operation(src, dest, file_hash=..., **kwargs) -> (error, file_hash), results come back in input order
+        file_hashes = list(file_hashes) if file_hashes is not None else [None] * len(srcs)
+        results = [None] * len(srcs)
+        queues = self.plan(srcs, dests, src_devs, sizes)
+        reading, writing = Counter(), Counter()
+        running = {}
+
+        def call(pos: int) -> tuple[Exception | None, str | None]:
+            try:
+                return operation(srcs[pos], dests[pos], file_hash=file_hashes[pos], **kwargs)
+            except Exception as e:
+                return e, file_hashes[pos]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while queues or running:
+                # round robin over device pairs with spare capacity on both sides
+                submitted = True
+                while submitted and len(running) < self.max_workers:
+                    submitted = False
+                    for key in list(queues):
+                        src_dev, dest_dev = key
+                        if len(running) >= self.max_workers:
+                            break
+                        if reading[src_dev] >= self.per_src_device or writing[dest_dev] >= self.per_dest_device:
+                            continue
+                        pos = queues[key].popleft()
+                        if not queues[key]:
+                            del queues[key]
+                        reading[src_dev] += 1
+                        writing[dest_dev] += 1
+                        running[pool.submit(call, pos)] = (pos, key)
+                        submitted = True
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pos, (src_dev, dest_dev) = running.pop(future)
+                    reading[src_dev] -= 1
+                    writing[dest_dev] -= 1
+                    results[pos] = future.result()
+                if progress is not None:
+                    progress(len(done))
+        return results
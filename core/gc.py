@@ -0,0 +1,101 @@
+from core.cache import Cache
+from core.pipelines import safe_stat, get_id
+from constants import Cols
+from dataclasses import dataclass, asdict
+import os
+import pandas as pd
+import time
+from utils.path import is_within
+
+MTIME_TOLERANCE = 1e-6
+
+@dataclass
+class RetentionPolicy:
+    verify_stat: bool = True            # stat every entry and drop missing or changed files
+    max_age_days: float | None = None   # drop entries not seen by a scan for longer than this
+    roots: list[str] | None = None      # keep only entries under these roots
+    max_entries: int | None = None      # keep at most this many, most recently seen first
+
+    @property
+    def uses_seen_at(self) -> bool:
+        # only expiry and capacity look at when an entry was last seen
+        return self.max_age_days is not None or self.max_entries is not None
+
+@dataclass
+class GCStats:
+    before: int = 0
+    missing: int = 0
+    changed: int = 0
+    unseen: int = 0
+    expired: int = 0
+    out_of_roots: int = 0
+    over_capacity: int = 0
+
+    @property
+    def evicted(self) -> int:
+        return self.missing + self.changed + self.unseen + self.expired + self.out_of_roots + self.over_capacity
+
+    @property
+    def after(self) -> int:
+        return self.before - self.evicted
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "evicted": self.evicted, "after": self.after}
+
+def entry_state(key: str, file_path: str, size, mtime) -> str:
+    stat = safe_stat(file_path) if isinstance(file_path, str) else None
+    if stat is None:
+        return "missing"
+    if get_id(stat) != key or stat.st_size != size or abs(stat.st_mtime - mtime) > MTIME_TOLERANCE:
+        return "changed"
+    return "valid"
+
+def evict(register: Cache, metadata: Cache, keys: list[str]) -> None:
+    if not keys:
+        return
+    for cache in (register, metadata):
+        stored = cache.get(keys, columns=[]).index.to_list()
+        if stored:
+            cache.delete(stored)
+
+def find_unseen(registered: pd.DataFrame, scanned_dirs: list[str], scan_keys: list[str]) -> list[str]:
+    # scanned directories were listed in full, so a registered file in one of them that the scan did not see is gone
+    file_dirs = registered[Cols.FILE_PATH].map(lambda path: os.path.dirname(path) if isinstance(path, str) else None)
+    unseen = file_dirs.isin(set(scanned_dirs)) & ~registered.index.isin(scan_keys)
+    return registered.index[unseen].to_list()
+
+def collect_garbage(register: Cache, metadata: Cache, policy: RetentionPolicy, scanned_dirs: list[str] | None = None, scan_keys: list[str] | None = None, now: float | None = None) -> GCStats:
+    now = time.time() if now is None else now
+    registered = register.get(columns=[Cols.FILE_PATH, Cols.SIZE, Cols.MODIFIED_AT, Cols.SEEN_AT])
+    stats = GCStats(before=len(registered))
+    evicted = {}
+
+    if scanned_dirs is not None and scan_keys is not None:
+        evicted.update((key, "unseen") for key in find_unseen(registered, scanned_dirs, scan_keys))
+
+    if policy.verify_stat:
+        for key, row in registered.drop(index=list(evicted)).iterrows():
+            state = entry_state(key, row[Cols.FILE_PATH], row[Cols.SIZE], row[Cols.MODIFIED_AT])
+            if state != "valid":
+                evicted[key] = state
+
+    if policy.roots is not None:
+        roots = [os.path.normpath(root) for root in policy.roots]
+        for key, file_path in registered[Cols.FILE_PATH].items():
+            if key not in evicted and not (isinstance(file_path, str) and any(is_within(os.path.normpath(file_path), root) for root in roots)):
+                evicted[key] = "out_of_roots"
+
+    # entries from before SeenAt was recorded have no age and are kept
+    seen_at = pd.to_numeric(registered[Cols.SEEN_AT], errors="coerce")
+    if policy.max_age_days is not None:
+        expired = seen_at.index[seen_at < now - policy.max_age_days * 86400]
+        evicted.update((key, "expired") for key in expired if key not in evicted)
+
+    if policy.max_entries is not None:
+        remaining = seen_at.drop(index=list(evicted)).sort_values(ascending=False, na_position="last")
+        evicted.update((key, "over_capacity") for key in remaining.index[policy.max_entries:])
+
+    for state in evicted.values():
+        setattr(stats, state, getattr(stats, state) + 1)
+    evict(register, metadata, list(evicted))
+    return stats
@@ -0,0 +1,99 @@
+from dataclasses import dataclass, field
+import json
+import numpy as np
+import os
+from typing import Any, Callable
+
+BORDER = None
+POINT_PRECISION = 6
+
+def load_rgeocoder(mode: int = 1, verbose: bool = False):
+    # reverse_geocoder pulls in scipy and indexes its city database, neither is needed until a cell misses
+    from reverse_geocoder import RGeocoder
+
+    return RGeocoder(mode=mode, verbose=verbose)
+
+@dataclass
+class GeoCache:
+    # country per grid cell of 10**-precision degrees, answered before the geocoder is built
+    # a cell whose corners and centre resolve to different countries is a border cell, its points go to the geocoder
+    # and are kept per point (to POINT_PRECISION decimals) so the same photos do not need the geocoder again
+    path: str | None
+    factory: Callable[[], Any]                  # builds the real geocoder (RGeocoder) on first miss
+    precision: int = 2
+    cells: dict[str, str | None] = field(default_factory=dict, repr=False)
+    points: dict[str, str] = field(default_factory=dict, repr=False)
+    geocoder: Any = field(default=None, repr=False)
+    hits: int = 0
+    misses: int = 0
+
+    def load(self) -> None:
+        self.cells, self.points = {}, {}
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            stored = json.load(f)
+        # cells quantised with another precision do not line up with this grid
+        if stored.get("precision") == self.precision:
+            self.cells, self.points = stored["cells"], stored["points"]
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as f:
+            json.dump({"precision": self.precision, "cells": self.cells, "points": self.points}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.cells, self.points = {}, {}
+
+    def _geocoder(self):
+        if self.geocoder is None:
+            self.geocoder = self.factory()
+        return self.geocoder
+
+    def _lookup(self, points: np.ndarray) -> list[str]:
+        return [location["cc"] for location in self._geocoder().query([tuple(point) for point in points])]
+
+    def _resolve_cells(self, cells: np.ndarray) -> None:
+        # corners and centre of every new cell in one geocoder query
+        size = 10.0 ** -self.precision
+        offsets = np.array([[0, 0], [0, 1], [1, 0], [1, 1], [0.5, 0.5]]) * size
+        points = (cells[:, None, :] * size + offsets[None, :, :]).reshape(-1, 2)
+        points[:, 0] = points[:, 0].clip(-90.0, 90.0)
+        codes = np.array(self._lookup(points), dtype=object).reshape(len(cells), len(offsets))
+        for (lat, lon), cell_codes in zip(cells, codes):
+            self.cells[f"{lat},{lon}"] = cell_codes[0] if len(set(cell_codes)) == 1 else BORDER
+
+    def query(self, coordinates: list[tuple[float, float]]) -> list[dict]:
+        # same shape as RGeocoder.query, only "cc" is filled in
+        if not coordinates:
+            return []
+        points = np.asarray(coordinates, dtype=float)
+        cells = np.floor(points * 10.0 ** self.precision).astype(np.int64)
+        keys = [f"{lat},{lon}" for lat, lon in cells]
+
+        new = {key: pos for pos, key in enumerate(keys) if key not in self.cells}
+        if new:
+            self._resolve_cells(cells[list(new.values())])
+        missed = sum(key in new for key in keys)
+        self.misses += missed
+        self.hits += len(keys) - missed
+
+        codes = [self.cells[key] for key in keys]
+        border = {}
+        for pos, code in enumerate(codes):
+            if code is BORDER:
+                point_key = f"{points[pos, 0]:.{POINT_PRECISION}f},{points[pos, 1]:.{POINT_PRECISION}f}"
+                codes[pos] = self.points.get(point_key)
+                if codes[pos] is None:
+                    border.setdefault(point_key, []).append(pos)
+        if border:
+            first = [positions[0] for positions in border.values()]
+            for (point_key, positions), code in zip(border.items(), self._lookup(points[first])):
+                self.points[point_key] = code
+                for pos in positions:
+                    codes[pos] = code
+        return [{"cc": code} for code in codes]
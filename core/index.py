@@ -0,0 +1,91 @@
+from dataclasses import dataclass, field
+from core.transformation import calc_partial_hash, calc_full_hash
+from dataframe.load import JSONLoader
+from dataframe.write import JSONWriter
+from constants import Cols
+import os
+import pandas as pd
+
+INDEX_COLS = [Cols.SIZE, Cols.MODIFIED_AT, Cols.PARTIAL_HASH, Cols.FILE_HASH]
+HASH_DTYPES = {Cols.PARTIAL_HASH: object, Cols.FILE_HASH: object}
+
+@dataclass
+class ContentIndex:
+    path: str
+    loader: JSONLoader
+    writer: JSONWriter
+    data: pd.DataFrame = None
+    by_size: dict[int, set[str]] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.writer.save(pd.DataFrame(), self.path)
+
+    def _require_loaded(self) -> None:
+        if self.data is None:
+            raise ValueError("Index not loaded")
+
+    def _rebuild(self) -> None:
+        # size -> dest paths, the only lookup that runs for every scanned file
+        self.by_size = {size: set(paths) for size, paths in self.data.groupby(Cols.SIZE).groups.items()}
+
+    def load(self) -> None:
+        self.data = self.loader.load(self.path).reindex(columns=INDEX_COLS).astype(HASH_DTYPES)
+        self._rebuild()
+
+    def clear(self) -> None:
+        self.data = pd.DataFrame(columns=INDEX_COLS).astype(HASH_DTYPES)
+        self.by_size = {}
+
+    def add(self, entries: pd.DataFrame) -> None:
+        self._require_loaded()
+        entries = entries.loc[entries[Cols.SIZE].notna()].reindex(columns=INDEX_COLS).astype(HASH_DTYPES)
+        self.delete(entries.index)
+        self.data = pd.concat([self.data, entries])
+        for path, size in entries[Cols.SIZE].items():
+            self.by_size.setdefault(size, set()).add(path)
+
+    def delete(self, paths: list[str]) -> None:
+        self._require_loaded()
+        stale = self.data.index.intersection(paths)
+        for path, size in self.data.loc[stale, Cols.SIZE].items():
+            self.by_size.get(size, set()).discard(path)
+        self.data = self.data.drop(index=stale)
+
+    def _resolve_hash(self, path: str, col: str) -> str | None:
+        # Hashes of archived files are computed on first collision and kept, never on every run
+        value = self.data.at[path, col]
+        if pd.notna(value):
+            return value
+        stat = os.stat(path) if os.path.isfile(path) else None
+        if stat is None or stat.st_size != self.data.at[path, Cols.SIZE] or stat.st_mtime != self.data.at[path, Cols.MODIFIED_AT]:
+            self.delete([path])
+            return None
+        value = calc_partial_hash(path) if col == Cols.PARTIAL_HASH else calc_full_hash(path)
+        self.data.at[path, col] = value
+        return value
+
+    def match(self, row: pd.Series) -> str | None:
+        file_path = row[Cols.FILE_PATH]
+        candidates = [path for path in self.by_size.get(row[Cols.SIZE], ()) if path != file_path]
+        if not candidates:
+            return None
+
+        partial_hash = calc_partial_hash(file_path)
+        full_hash = row.get(Cols.FILE_HASH)
+        if not partial_hash:
+            return None
+
+        for path in candidates:
+            if self._resolve_hash(path, Cols.PARTIAL_HASH) != partial_hash:
+                continue
+            if pd.isna(full_hash):
+                full_hash = calc_full_hash(file_path)
+            if full_hash and self._resolve_hash(path, Cols.FILE_HASH) == full_hash:
+                return path
+        return None
+
+    def save(self) -> None:
+        self._require_loaded()
+        self.writer.save(self.data, self.path, dropna=False)
@@ -0,0 +1,85 @@
+from dataclasses import dataclass, field
+import json
+import os
+from typing import Any, Iterator, TextIO
+
+def fsync_file(path: str) -> None:
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())
+
+@dataclass
+class Journal:
+    # JSON-lines log of cache mutations since the last snapshot
+    path: str
+    threshold: int = 32 * 1024 * 1024
+    handle: TextIO | None = field(default=None, repr=False)
+
+    @property
+    def rotated_path(self) -> str:
+        return f"{self.path}.compacting"
+
+    @property
+    def is_open(self) -> bool:
+        return self.handle is not None
+
+    def open(self) -> None:
+        if self.handle is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.handle = open(self.path, mode="a", encoding="utf-8")
+
+    def close(self) -> None:
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+    def append(self, op: str, payload: Any) -> None:
+        self.handle.write(json.dumps({"op": op, "data": payload}, ensure_ascii=False) + "\n")
+
+    def checkpoint(self) -> None:
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+
+    def size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def needs_compaction(self) -> bool:
+        return self.size() > self.threshold
+
+    def replay(self) -> Iterator[tuple[str, Any]]:
+        # a rotated journal is left behind only if compaction was interrupted, it is older than the live one
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            end = 0
+            with open(path, mode="rb") as f:
+                for line in f:
+                    try:
+                        # a record is only complete with its newline, appends write both at once
+                        if not line.endswith(b"\n"):
+                            raise ValueError("Unterminated record")
+                        record = json.loads(line)
+                    except ValueError:
+                        break # torn write at the tail, nothing after it was checkpointed
+                    end += len(line)
+                    yield record["op"], record["data"]
+            if end < os.path.getsize(path):
+                # cut the torn tail, records appended later would otherwise continue its line and be lost with it
+                with open(path, mode="rb+") as f:
+                    f.truncate(end)
+
+    def rotate(self) -> None:
+        self.close()
+        if os.path.exists(self.path):
+            os.replace(self.path, self.rotated_path)
+        self.open()
+
+    def discard_rotated(self) -> None:
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def truncate(self) -> None:
+        self.close()
+        self.discard_rotated()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.open()
@@ -1,13 +1,15 @@
-from core.transformation import calc_full_hash
+from core.index import ContentIndex
+from core.transformation import calc_full_hashes
 from dataframe.pipeline import Pipeline, AssignTags, FilterCols, FilterRows, Compute
+from dataframe.planner import optimize
 from dataframe.col_filter import NameFilter, KeywordFilter, TagFilter, CombinedFilter
-from dataframe.processor import ElementProcessor, RowProcessor, ColProcessor
+from dataframe.processor import ElementProcessor, RowProcessor, ColProcessor, VectorProcessor
 from dataframe.predicate import Predicate, Condition, And, Or, AllRows
 from dataframe.context import Context
-import datetime as dt
+from dateutil.tz import tzlocal
+import numpy as np
 import pandas as pd
-from reverse_geocoder import RGeocoder
-from utils.path import is_not_dir, get_normalized_path, depth_from_drive, tree_depth, parse_filename
+from utils.path import is_not_dir, get_normalized_path, depth_from_drive, tree_depth
 from utils.text import lowercase_text, uppercase_text
 import os
 import hashlib
@@ -38,6 +40,9 @@ def label_bool(value: bool, labels: dict) -> str:
         return None
     return labels.get(value, None)
 
+def label_notna(value, label: str) -> str:
+    return label if pd.notna(value) else None
+
 def safe_stat(file_path: str) -> os.stat_result | None:
     if os.path.isfile(file_path):
         try:
@@ -55,32 +60,60 @@ def get_dev(stat: os.stat_result) -> int | None:
 def get_id(stat: os.stat_result) -> str | None:
     return hashlib.md5(f"{stat.st_dev}|{stat.st_ino}".encode()).hexdigest() if stat is not None else None
 
-def build_unique_filename(filename: str, ino: int) -> str:
-    stem, ext = parse_filename(filename)
-    return f"{stem}_{str(ino)}.{ext}"
-
-def build_file_path(row: pd.Series) -> str:
-    dir_path = next(row[col] for col in row.index if Cols.FILE_DIR_PATH in col)
-    filename = build_unique_filename(row[Cols.FILE_NAME], row[Cols.INODE]) if row.get(dup_col(Cols.FILE_NAME), False) else row[Cols.FILE_NAME]
-    return os.path.join(dir_path, filename)
-
-def build_dir_path(row: pd.Series, root: str) -> str:
-    components = [str(value) for value in row if pd.notna(value)]
-    return os.path.join(root, *components)
-
-def resolve_ext(row: pd.Series) -> str:
-    _, ext = parse_filename(row[Cols.FILE_NAME])
-    exif_ext = row[Cols.FILE_TYPE_EXT]
-    return uppercase_text(ext) if pd.isna(exif_ext) else exif_ext
-
-def get_country(row: pd.Series, geocoder: RGeocoder) -> str:
-    lat = row[Cols.EXIF_GPS_LATITUDE]
-    lon = row[Cols.EXIF_GPS_LONGITUDE]
-    
-    if pd.isna(lat) or pd.isna(lon):
-        return None
-
-    return geocoder.query([(lat, lon)])[0]["cc"]
+def split_filenames(filenames: pd.Series) -> tuple[pd.Series, pd.Series]:
+    # parse_filename over a column, leading and trailing dots are dropped before the last one splits stem and ext
+    stripped = filenames.str.strip(".")
+    parts = stripped.str.rpartition(".")
+    has_ext = parts[1] == "."
+    stem = parts[0].where(has_ext, stripped)
+    ext = parts[2].where(has_ext, "")
+    return stem, ext
+
+def join_paths(dirs: pd.Series, names: pd.Series) -> pd.Series:
+    # os.path.join of two columns, no separator is added after an empty dir or one that already ends with it
+    seps = tuple(sep for sep in (os.sep, os.altsep) if sep)
+    no_sep = dirs.str.endswith(seps) | (dirs == "")
+    return dirs + pd.Series(np.where(no_sep, "", os.sep), index=dirs.index) + names
+
+def build_unique_filenames(filenames: pd.Series, inos: pd.Series) -> pd.Series:
+    stem, ext = split_filenames(filenames)
+    return stem + "_" + inos.astype(str) + "." + ext
+
+def build_file_paths(df: pd.DataFrame) -> pd.Series:
+    dir_path = next(col for col in df.columns if Cols.FILE_DIR_PATH in col)
+    filenames = df[Cols.FILE_NAME]
+    if dup_col(Cols.FILE_NAME) in df.columns:
+        is_dup = df[dup_col(Cols.FILE_NAME)].fillna(False).astype(bool)
+        filenames = filenames.mask(is_dup, build_unique_filenames(filenames, df[Cols.INODE]))
+    return join_paths(df[dir_path], filenames)
+
+def build_dir_paths(df: pd.DataFrame, root: str) -> pd.Series:
+    dir_paths = pd.Series(root, index=df.index, dtype=object)
+    for col in df.columns:
+        present = df[col].notna()
+        if present.any():
+            component = df[col].astype(str)
+            dir_paths = dir_paths.mask(present, join_paths(dir_paths, component))
+    return dir_paths
+
+def resolve_exts(df: pd.DataFrame) -> pd.Series:
+    _, ext = split_filenames(df[Cols.FILE_NAME])
+    exif_ext = df[Cols.FILE_TYPE_EXT]
+    return exif_ext.where(exif_ext.notna(), ext.str.upper())
+
+def get_countries(df: pd.DataFrame, geocoder) -> pd.Series:
+    # every distinct (lat, lon) pair is looked up in a single query, rows missing either stay None
+    # geocoder is anything with RGeocoder.query: an RGeocoder or a GeoCache in front of one
+    coords = df[[Cols.EXIF_GPS_LATITUDE, Cols.EXIF_GPS_LONGITUDE]].dropna()
+    countries = pd.Series([None] * len(df.index), index=df.index, dtype=object)
+    if coords.empty:
+        return countries
+    unique_coords = coords.drop_duplicates()
+    codes = [location["cc"] for location in geocoder.query(list(unique_coords.itertuples(index=False, name=None)))]
+    keys = pd.MultiIndex.from_frame(coords)
+    lookup = pd.Series(codes, index=pd.MultiIndex.from_frame(unique_coords))
+    countries[coords.index] = lookup.reindex(keys).to_numpy()
+    return countries
 
 def get_worksheets_count(heading_pairs: list, target_headings: list[str] = []) -> int:
     
@@ -91,11 +124,11 @@ def get_worksheets_count(heading_pairs: list, target_headings: list[str] = []) -
         if heading in target_headings and i + 1 < len(heading_pairs):
             return heading_pairs[i + 1]
 
-def get_earliest_year(row: pd.Series) -> int:
-    timestamp = row.min()
-    if pd.isna(timestamp):
-        return dt.datetime.fromtimestamp(0.0).year
-    return dt.datetime.fromtimestamp(timestamp).year
+def get_earliest_year(df: pd.DataFrame) -> pd.Series:
+    # rows without any date fall back to the epoch, in local time like datetime.fromtimestamp
+    # whole seconds keep dates before 1677 in range, flooring does not change the year
+    seconds = np.floor(df.astype("float64").min(axis=1).fillna(0.0)).astype("int64")
+    return pd.to_datetime(seconds, unit="s", utc=True).dt.tz_convert(tzlocal()).dt.year
 
 ###############################
 #### DF PIPELINE FUNCTIONS ####
@@ -107,18 +140,20 @@ def prepare_dirs():
     return Pipeline(
         [
             Compute(ElementProcessor(get_normalized_path), NameFilter(Cols.SRC_ROOT)),
-            Compute(ElementProcessor(is_not_dir), NameFilter(Cols.SRC_ROOT), dest_col=Cols.ROOT_INVALID),
+            Compute(ElementProcessor(is_not_dir), NameFilter(Cols.SRC_ROOT), dest_col=Cols.ROOT_INVALID, dtype="boolean"),
             *flag_dup(Cols.SRC_ROOT, func=duplicated, keep="first"),
             FilterRows(And([Condition(Cols.ROOT_INVALID, "eq", False), Condition(dup_col(Cols.SRC_ROOT), "eq", False)])),
-        ]
+        ],
+        name="prepare_dirs"
     )
 
 def add_depth_metrics():
     return Pipeline(
         [
-            Compute(ElementProcessor(depth_from_drive), NameFilter(Cols.SRC_ROOT), dest_col=Cols.ROOT_DEPTH),
-            Compute(ElementProcessor(tree_depth), NameFilter(Cols.SRC_ROOT), dest_col=Cols.ROOT_TREE_DEPTH),
-        ]
+            Compute(ElementProcessor(depth_from_drive), NameFilter(Cols.SRC_ROOT), dest_col=Cols.ROOT_DEPTH, dtype="Int64"),
+            Compute(ElementProcessor(tree_depth), NameFilter(Cols.SRC_ROOT), dest_col=Cols.ROOT_TREE_DEPTH, dtype="Int64"),
+        ],
+        name="add_depth_metrics"
     )
 
 ### FILES
@@ -129,7 +164,8 @@ def flag_dup(col: str, func=duplicated, keep: Literal[False, "first", "last"] =
         processor=ColProcessor(func, keep=keep),
         col_filter=NameFilter(col),
         dest_col=dup_col(col),
-        where=AllRows() if where is None else where
+        where=AllRows() if where is None else where,
+        dtype="boolean"
     )
 
     if labels:
@@ -137,13 +173,36 @@ def flag_dup(col: str, func=duplicated, keep: Literal[False, "first", "last"] =
             processor=ElementProcessor(label_bool, labels=labels),
             col_filter=NameFilter(dup_col(col)),
             dest_col=dup_label_col(col),
-            where=AllRows() if where is None else where
+            where=AllRows() if where is None else where,
+            dtype="str"
         )
 
         return [dup, dup_label]
 
     return [dup]
 
+def flag_indexed_dup(index: ContentIndex | None, label: str = "dup"):
+
+    if index is None:
+        return []
+
+    return [
+        Compute(
+            processor=RowProcessor(index.match),
+            col_filter=NameFilter([Cols.FILE_PATH, Cols.SIZE, Cols.FILE_HASH]),
+            dest_col=Cols.INDEXED_PATH,
+            where=Condition(Cols.SIZE, "notna"),
+            dtype="str"
+        ),
+        Compute(
+            processor=ElementProcessor(label_notna, label=label),
+            col_filter=NameFilter(Cols.INDEXED_PATH),
+            dest_col=dup_label_col(Cols.FILE_HASH),
+            where=Condition(Cols.INDEXED_PATH, "notna"),
+            dtype="str"
+        ),
+    ]
+
 def assemble_file_path(prefix: Literal["", "Dest"]):
 
     file_dir_path = dest_col(Cols.FILE_DIR_PATH) if prefix else Cols.FILE_DIR_PATH
@@ -153,13 +212,15 @@ def assemble_file_path(prefix: Literal["", "Dest"]):
         return Pipeline(
             [
                 *flag_dup(Cols.FILE_NAME, func=duplicated_ci, keep="first"),
-                Compute(RowProcessor(build_file_path), NameFilter([file_dir_path, Cols.FILE_NAME, dup_col(Cols.FILE_NAME), Cols.INODE]), dest_col=file_path),
-            ]
+                Compute(VectorProcessor(build_file_paths), NameFilter([file_dir_path, Cols.FILE_NAME, dup_col(Cols.FILE_NAME), Cols.INODE]), dest_col=file_path, dtype="str"),
+            ],
+            name=f"assemble_file_path[{prefix}]"
         )
     return Pipeline(
         [
-            Compute(RowProcessor(build_file_path), NameFilter([file_dir_path, Cols.FILE_NAME]), dest_col=file_path)
-        ]
+            Compute(VectorProcessor(build_file_paths), NameFilter([file_dir_path, Cols.FILE_NAME]), dest_col=file_path, dtype="str")
+        ],
+        name="assemble_file_path"
     )
 
 def add_stat(prefix: Literal["", "Dest"], metrics: list[str]):
@@ -174,18 +235,23 @@ def add_stat(prefix: Literal["", "Dest"], metrics: list[str]):
     id = dest_col(Cols.FILE_ID) if prefix else Cols.FILE_ID
 
     stat_metrics = {
-        "size": Compute(ElementProcessor(get_size), NameFilter(stat), dest_col=size),
-        "mtime": Compute(ElementProcessor(get_mtime), NameFilter(stat), dest_col=mtime),
-        "dev": Compute(ElementProcessor(get_dev), NameFilter(stat), dest_col=dev),
-        "ino": Compute(ElementProcessor(get_ino), NameFilter(stat), dest_col=ino),
-        "id": Compute(ElementProcessor(get_id), NameFilter(stat), dest_col=id)
+        "size": Compute(ElementProcessor(get_size), NameFilter(stat), dest_col=size, dtype="Int64"),
+        "mtime": Compute(ElementProcessor(get_mtime), NameFilter(stat), dest_col=mtime, dtype="Float64"),
+        "dev": Compute(ElementProcessor(get_dev), NameFilter(stat), dest_col=dev, dtype="UInt64"),
+        "ino": Compute(ElementProcessor(get_ino), NameFilter(stat), dest_col=ino, dtype="UInt64"),
+        "id": Compute(ElementProcessor(get_id), NameFilter(stat), dest_col=id, dtype="str")
     }
 
-    return Pipeline(
-        [
-            Compute(ElementProcessor(safe_stat), NameFilter(file_path), dest_col=stat),
-            *[stat_metrics[m] for m in metrics]
-        ]
+    # the stat metrics are read from the same column and fused into one pass
+    return optimize(
+        Pipeline(
+            [
+                Compute(ElementProcessor(safe_stat), NameFilter(file_path), dest_col=stat, parallel="thread"),
+                *[stat_metrics[m] for m in metrics]
+            ],
+            name=f"add_stat[{prefix}]" if prefix else "add_stat"
+        ),
+        outputs=[stat_metrics[m].dest_col for m in metrics]
     )
 
 def tag_columns(ctx: Context, *, name_tags: dict = None, keyword_tags: dict = None):
@@ -195,7 +261,7 @@ def tag_columns(ctx: Context, *, name_tags: dict = None, keyword_tags: dict = No
         *[AssignTags(KeywordFilter(keywords), tag) for tag, keywords in keyword_tags.items()],
         *[AssignTags(NameFilter(names), tag) for tag, names in name_tags.items()]
         ]
-    return Pipeline(steps, context=ctx)
+    return Pipeline(steps, context=ctx, name="tag_columns")
 
 def select_columns(ctx: Context, *, names: list[str] = None, keywords: list[str] = None, tags: list[str] = None):
     names = names or []
@@ -213,15 +279,17 @@ def select_columns(ctx: Context, *, names: list[str] = None, keywords: list[str]
                 )
             ),
         ],
-        context=ctx
+        context=ctx,
+        name="select_columns"
     )
 
 def consolidate_file_ext(ctx: Context):
     return Pipeline(
         [
-            Compute(RowProcessor(resolve_ext), NameFilter([Cols.FILE_TYPE_EXT, Cols.FILE_NAME]), Cols.CONSOLIDATED_EXT),
+            Compute(VectorProcessor(resolve_exts), NameFilter([Cols.FILE_TYPE_EXT, Cols.FILE_NAME]), Cols.CONSOLIDATED_EXT, dtype="str"),
         ],
-        context=ctx
+        context=ctx,
+        name="consolidate_file_ext"
     )
 
 def exclude_rows(ctx: Context, *, col: str, values: list):
@@ -231,7 +299,8 @@ def exclude_rows(ctx: Context, *, col: str, values: list):
         [
             FilterRows(And(conditions))
         ],
-        context=ctx
+        context=ctx,
+        name="exclude_rows"
     )
 
 def include_rows(ctx: Context, *, col: str, values: list):
@@ -241,64 +310,81 @@ def include_rows(ctx: Context, *, col: str, values: list):
         [
             FilterRows(And(conditions))
         ],
-        context=ctx
+        context=ctx,
+        name="include_rows"
     )
 
-def assemble_dest_dir(ctx: Context, dest_root: str, dest_structure: list[str]):
+def assemble_dest_dir(ctx: Context, dest_root: str, dest_structure: list[str], index: ContentIndex | None = None):
+    # steps are only built for the requested layers, so the date parser and geocoder are not touched otherwise
     components_calc = {
-        dup_label_col(Cols.FILE_HASH): [
+        dup_label_col(Cols.FILE_HASH): lambda: [
             *flag_dup(Cols.SIZE, func=duplicated, keep=False, where=Condition(Cols.SIZE, "notna")),
             Compute(
-                processor=ElementProcessor(calc_full_hash),
-                col_filter=NameFilter(Cols.FILE_PATH),
+                processor=ColProcessor(calc_full_hashes, scheduler=ctx.scheduler),
+                col_filter=NameFilter([Cols.FILE_PATH, Cols.INODE_DEV, Cols.INODE]),
                 dest_col=Cols.FILE_HASH,
-                where=Condition(dup_col(Cols.SIZE), "eq", True)
+                where=Condition(dup_col(Cols.SIZE), "eq", True),
+                dtype="str"
             ),
             *flag_dup(Cols.FILE_HASH, func=duplicated, keep="first", labels={True:"dup", False:""}, where=Condition(dup_col(Cols.SIZE), "eq", True)),
+            *flag_indexed_dup(index),
         ],
-        Cols.FILE_CATEGORY: [
+        Cols.FILE_CATEGORY: lambda: [
              Compute(
                 processor=ColProcessor(pd.DataFrame.fillna, value="Other"),
                 col_filter=NameFilter(Cols.FILE_CATEGORY)
             ),
         ],
-        Cols.EARLIEST_YEAR: [
+        Cols.EARLIEST_YEAR: lambda: [
             Compute(
-                processor=ElementProcessor(ctx.parser.parse),
-                col_filter=TagFilter([Tags.CREATE_DT, Tags.ACCESS_DT, Tags.MODIFY_DT])
+                processor=ColProcessor(ctx.parser.parse_frame),
+                col_filter=TagFilter([Tags.CREATE_DT, Tags.ACCESS_DT, Tags.MODIFY_DT]),
+                memo=True
             ), 
             Compute(
-                processor=RowProcessor(get_earliest_year),
+                processor=VectorProcessor(get_earliest_year),
                 col_filter=TagFilter([Tags.CREATE_DT, Tags.ACCESS_DT, Tags.MODIFY_DT]),
-                dest_col=Cols.EARLIEST_YEAR
+                dest_col=Cols.EARLIEST_YEAR,
+                dtype="Int64"
             )
         ],
-        Cols.IMAGE_COUNTRY: [
+        Cols.IMAGE_COUNTRY: lambda: [
             Compute(
-                processor=RowProcessor(get_country, geocoder=ctx.geocoder),
+                processor=VectorProcessor(get_countries, geocoder=ctx.geocoder),
                 col_filter=NameFilter([Cols.EXIF_GPS_LATITUDE, Cols.EXIF_GPS_LONGITUDE]),
                 dest_col=Cols.IMAGE_COUNTRY,
-                where=Condition(Cols.FILE_CATEGORY, "eq", "Image")
+                where=Condition(Cols.FILE_CATEGORY, "eq", "Image"),
+                memo=True,
+                dtype="str"
             )
         ],
-        Cols.WORKSHEETS_COUNT: [
+        Cols.WORKSHEETS_COUNT: lambda: [
             Compute(
                 processor=ElementProcessor(get_worksheets_count, target_headings=["Worksheets", "Листы"]),
                 col_filter=NameFilter(Cols.XML_HEADING_PAIRS), 
                 dest_col=Cols.WORKSHEETS_COUNT,
-                where=Condition(Cols.FILE_CATEGORY, "eq", "Data-Excel")
+                where=Condition(Cols.FILE_CATEGORY, "eq", "Data-Excel"),
+                memo=True,
+                dtype="Int64"
             )
         ],
     }
 
     steps = []
     for layer in dest_structure:
-       steps.extend(components_calc.get(layer, []))
+        if layer in components_calc:
+            steps.extend(components_calc[layer]())
 
-    return Pipeline(
-        [
-            *steps,
-            Compute(RowProcessor(build_dir_path, root=dest_root), NameFilter(dest_structure), dest_col=dest_col(Cols.FILE_DIR_PATH))
-        ],
-        context=ctx
+    # the duplicate size mask is shared by the hashing steps
+    return optimize(
+        Pipeline(
+            [
+                *steps,
+                Compute(VectorProcessor(build_dir_paths, root=dest_root), NameFilter(dest_structure), dest_col=dest_col(Cols.FILE_DIR_PATH), dtype="str")
+            ],
+            context=ctx,
+            name="assemble_dest_dir"
+        ),
+        # the file operation reuses the hashes computed for duplicate detection
+        outputs=[*dest_structure, dest_col(Cols.FILE_DIR_PATH), Cols.FILE_HASH]
     )
\ No newline at end of file
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import os
+import pandas as pd
+import struct
+from typing import Callable, Iterable
+
+try:
+    import fcntl
+except ImportError: # not available on Windows, inode order is used instead
+    fcntl = None
+
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_HEADER = "=QQLLLL"       # fm_start, fm_length, fm_flags, fm_mapped_extents, fm_extent_count, fm_reserved
+FIEMAP_EXTENT = "=QQQQQLLLL"    # fe_logical, fe_physical, fe_length, fe_reserved64[2], fe_flags, fe_reserved[3]
+UNKNOWN_DEV = -1
+
+def get_physical_offset(path: str) -> int | None:
+    if fcntl is None:
+        return None
+    header_size = struct.calcsize(FIEMAP_HEADER)
+    buf = bytearray(struct.pack(FIEMAP_HEADER, 0, 2**64 - 1, 0, 0, 1, 0) + bytes(struct.calcsize(FIEMAP_EXTENT)))
+    try:
+        with open(path, "rb") as f:
+            fcntl.ioctl(f.fileno(), FS_IOC_FIEMAP, buf)
+    except OSError:
+        return None
+    if not struct.unpack_from(FIEMAP_HEADER, buf)[3]:
+        return None
+    return struct.unpack_from(FIEMAP_EXTENT, buf, header_size)[1]
+
+@dataclass
+class IOScheduler:
+    use_extents: bool = False
+    max_devices: int | None = None
+
+    def _locate(self, path: str, dev, ino) -> tuple[int, int]:
+        if pd.isna(dev) or pd.isna(ino):
+            try:
+                stat = os.stat(path)
+                dev, ino = stat.st_dev, stat.st_ino
+            except OSError:
+                return UNKNOWN_DEV, 0
+        offset = get_physical_offset(path) if self.use_extents else None
+        return int(dev), (int(ino) if offset is None else offset)
+
+    def plan(self, paths: list[str], devs: Iterable | None = None, inos: Iterable | None = None) -> dict[int, list[int]]:
+        # device -> positions of paths, ordered by physical location (extent) or inode number
+        devs = list(devs) if devs is not None else [None] * len(paths)
+        inos = list(inos) if inos is not None else [None] * len(paths)
+        queues = {}
+        for pos, (path, dev, ino) in enumerate(zip(paths, devs, inos)):
+            dev, order = self._locate(path, dev, ino)
+            queues.setdefault(dev, []).append((order, pos))
+        return {dev: [pos for _, pos in sorted(queue)] for dev, queue in queues.items()}
+
+    def run(self, worker: Callable[[list[int]], None], queues: dict[int, list[int]]) -> None:
+        # one worker per device, so separate disks are read in parallel and each disk sequentially
+        if len(queues) <= 1:
+            for queue in queues.values():
+                worker(queue)
+            return
+        with ThreadPoolExecutor(max_workers=self.max_devices or len(queues)) as pool:
+            list(pool.map(worker, queues.values()))
+
+    def map(self, func: Callable, paths: list[str], devs: Iterable | None = None, inos: Iterable | None = None, **kwargs) -> list:
+        results = [None] * len(paths)
+
+        def drain(queue: list[int]) -> None:
+            for pos in queue:
+                results[pos] = func(paths[pos], **kwargs)
+
+        self.run(drain, self.plan(paths, devs, inos))
+        return results
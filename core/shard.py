@@ -0,0 +1,208 @@
+from concurrent.futures import ThreadPoolExecutor
+from constants import Cols
+from core.cache import Cache
+from core.journal import fsync_file
+from dataclasses import dataclass, field
+import json
+import os
+import pandas as pd
+from typing import Callable, Iterable
+
+MANIFEST = "manifest.json"
+
+def device_shard(dev) -> str:
+    return f"dev-{int(dev)}"
+
+def root_shard(root: str) -> str:
+    # roots that do not exist yet (a new destination) live on the device of their closest existing parent
+    path = os.path.abspath(root)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return device_shard(os.stat(path).st_dev)
+
+@dataclass
+class ShardedCache(Cache):
+    # one cache per device under path, the manifest lists the shards and the roots organised from each of them
+    path: str
+    factory: Callable[[str], Cache]                         # shard base path -> cache
+    max_workers: int | None = None
+    manifest: dict[str, dict] = None
+    shards: dict[str, Cache] = field(default_factory=dict, repr=False)
+    routes: dict[str, str] = field(default_factory=dict, repr=False)    # key -> shard
+    selected: list[str] | None = None
+    dirty: set[str] = field(default_factory=set, repr=False)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, MANIFEST)
+
+    def _require_loaded(self) -> None:
+        if self.manifest is None:
+            raise ValueError("Cache not loaded")
+
+    def _read_manifest(self) -> dict[str, dict]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self) -> None:
+        # another process may have added shards for its own roots since we read it
+        manifest = self._read_manifest()
+        for name, entry in self.manifest.items():
+            roots = manifest.setdefault(name, {"roots": []})["roots"]
+            roots.extend(root for root in entry["roots"] if root not in roots)
+        self.manifest = manifest
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=4, ensure_ascii=False)
+        fsync_file(tmp_path)
+        os.replace(tmp_path, self.manifest_path)
+
+    def select(self, roots: list[str]) -> None:
+        # only the shards of these roots are loaded, others are opened on first use
+        self.selected = []
+        for root in roots:
+            name = root_shard(root)
+            if name not in self.selected:
+                self.selected.append(name)
+
+    def assign(self, routes: dict[str, str]) -> None:
+        # new keys have to be routed before they are added or cloned to
+        self.routes.update(routes)
+
+    def _open(self, name: str) -> Cache:
+        shard = self.factory(os.path.join(self.path, name))
+        shard.load()
+        return shard
+
+    def _attach(self, name: str, shard: Cache) -> None:
+        self.shards[name] = shard
+        self.routes.update(dict.fromkeys(shard.get(columns=[]).index, name))
+        self.manifest.setdefault(name, {"roots": []})
+
+    def _shard(self, name: str) -> Cache:
+        if name not in self.shards:
+            self._attach(name, self._open(name))
+        return self.shards[name]
+
+    def _route(self, keys: Iterable[str]) -> dict[str, list[str]]:
+        groups = {}
+        unrouted = []
+        for key in keys:
+            name = self.routes.get(key)
+            if name is None:
+                unrouted.append(key)
+            else:
+                groups.setdefault(name, []).append(key)
+        if unrouted:
+            raise KeyError(f"Entries not routed to a shard: {unrouted}")
+        return groups
+
+    @property
+    def columns(self) -> list[str]:
+        self._require_loaded()
+        return list(dict.fromkeys(col for shard in self.shards.values() for col in shard.columns))
+
+    def load(self) -> None:
+        self.manifest = self._read_manifest()
+        self.shards, self.routes, self.dirty = {}, {}, set()
+        names = list(self.manifest) if self.selected is None else self.selected
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for name, shard in zip(names, executor.map(self._open, names)):
+                self._attach(name, shard)
+
+    def clear(self) -> None:
+        self.load()
+        for name, shard in self.shards.items():
+            shard.clear()
+            self.dirty.add(name)
+        self.routes = {}
+
+    def get(self, keys: Iterable[str] | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+        self._require_loaded()
+        if keys is None:
+            frames = [shard.get(columns=columns) for shard in self.shards.values()]
+        else:
+            keys = [key for key in dict.fromkeys(keys) if key in self.routes]
+            frames = [self._shard(name).get(shard_keys, columns=columns) for name, shard_keys in self._route(keys).items()]
+        frames = [df for df in frames if len(df.index)]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(frames) if len(frames) > 1 else frames[0]
+        return df if columns is None else df.reindex(columns=columns)
+
+    def add(self, new_entries: pd.DataFrame) -> None:
+        self._require_loaded()
+        for name, keys in self._route(new_entries.index).items():
+            self._shard(name).add(new_entries.loc[keys])
+            self.dirty.add(name)
+
+    def update(self, changed_entries: pd.DataFrame) -> None:
+        self._require_loaded()
+        for name, keys in self._route(changed_entries.index).items():
+            self._shard(name).update(changed_entries.loc[keys])
+            self.dirty.add(name)
+
+    def clone(self, src_to_dest: dict) -> None:
+        self._require_loaded()
+        src_shards = {key: name for name, keys in self._route(src_to_dest).items() for key in keys}
+        dest_shards = {key: name for name, keys in self._route(src_to_dest.values()).items() for key in keys}
+        pairs = {}
+        for src, dest in src_to_dest.items():
+            pairs.setdefault((src_shards[src], dest_shards[dest]), {})[src] = dest
+        for (src_name, dest_name), mapping in pairs.items():
+            if src_name == dest_name:
+                self._shard(src_name).clone(mapping)
+            else:
+                # crossing devices, the entry is copied into the other shard
+                entries = self._shard(src_name).get(list(mapping)).rename(index=mapping)
+                self._shard(dest_name).add(entries)
+            self.dirty.add(dest_name)
+
+    def delete(self, entry_ids: list) -> None:
+        self._require_loaded()
+        entry_ids = [key for key in entry_ids if key in self.routes]
+        for name, keys in self._route(entry_ids).items():
+            self._shard(name).delete(keys)
+            self.dirty.add(name)
+            for key in keys:
+                del self.routes[key]
+
+    def record_roots(self, roots: list[str]) -> None:
+        self._require_loaded()
+        for root in roots:
+            entry = self.manifest.setdefault(root_shard(root), {"roots": []})
+            if root not in entry["roots"]:
+                entry["roots"].append(root)
+
+    def save(self, dropna: bool = False) -> None:
+        # only shards touched in this run are written, each by its own thread
+        self._require_loaded()
+        names = [name for name in self.dirty if name in self.shards]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(lambda name: self.shards[name].save(dropna=dropna), names))
+        self._write_manifest()
+        self.dirty = set()
+
+def migrate_flat_cache(flat: Cache, sharded: ShardedCache, routes: dict[str, str] | None = None, dropna: bool = False) -> dict[str, str]:
+    # one-time move of a cache from before sharding, done once the sharded cache has no manifest yet
+    # entries go to the shard of the device their path is on, or the one given in routes; the flat files are left in place
+    if os.path.exists(sharded.manifest_path):
+        return {}
+    flat.load()
+    df = flat.get()
+    routes = dict(routes or {})
+    if Cols.FILE_PATH in df.columns:
+        for key, path in df[Cols.FILE_PATH].items():
+            if key not in routes and isinstance(path, str) and path:
+                routes[key] = root_shard(path)
+    df = df[df.index.isin(list(routes))]
+    if not len(df.index):
+        return routes
+    sharded.load()
+    sharded.assign({key: routes[key] for key in df.index})
+    sharded.add(df)
+    sharded.save(dropna=dropna)
+    return routes
@@ -1,10 +1,71 @@
+from collections import OrderedDict
+from constants import Cols
+from dataclasses import dataclass, field
 import datetime as dt
+from dateutil.tz import tzlocal
+import numpy as np
 import pandas as pd
 from utils.text import get_chars_pattern
 import hashlib
+import json
+import os
+import random
+import shutil
+
+EPOCH = pd.Timestamp(0, tz="UTC").as_unit("s")
+ASCII_SHAPES = {
+    code: "d" if char.isdigit() else "l" if char.isalpha() else "w" if char.isspace() else "s"
+    for code, char in ((code, chr(code)) for code in range(128))
+}
+ASCII_SEPARATORS = {code: None for code, shape in ASCII_SHAPES.items() if shape != "s"}
+
+def get_chars_patterns(values: list[str]) -> tuple[list[str], list[str]]:
+    # get_chars_pattern for many strings: ASCII ones go through translate tables, the rest through the character loop
+    shapes, separators = [], []
+    for value in values:
+        if value.isascii():
+            shapes.append(value.translate(ASCII_SHAPES))
+            separators.append(value.translate(ASCII_SEPARATORS))
+        else:
+            chars_pattern, sep_args = get_chars_pattern(value)
+            shapes.append(chars_pattern)
+            separators.append("".join(sep_args.values()))
+    return shapes, separators
+
+def to_timestamps(values: pd.Series, dt_strf: str) -> pd.Series:
+    # unix timestamps as datetime.timestamp() gives them: naive dates are local time, NaN where parsing fails
+    try:
+        dates = pd.to_datetime(values, format=dt_strf, errors="coerce", utc="%z" in dt_strf)
+    except ValueError:
+        return pd.Series(np.nan, index=values.index)
+    if dates.dt.tz is None:
+        dates = dates.dt.tz_localize(tzlocal(), ambiguous=np.ones(len(dates), dtype=bool), nonexistent="shift_forward")
+    return (dates - EPOCH) / pd.Timedelta(seconds=1)
+
+@dataclass
+class Reservoir:
+    # uniform sample of at most size distinct values, with how often each sampled value was seen
+    size: int = 100
+    seen: int = 0
+    samples: dict[str, int] = field(default_factory=dict)
+    rng: random.Random = field(default_factory=random.Random, repr=False)
+
+    def add(self, value: str, count: int = 1) -> None:
+        # a value already kept only adds to its count, any other is a new candidate for the sample
+        if value in self.samples:
+            self.samples[value] += count
+            return
+        self.seen += 1
+        if len(self.samples) < self.size:
+            self.samples[value] = count
+            return
+        slot = self.rng.randrange(self.seen)
+        if slot < self.size:
+            del self.samples[list(self.samples)[slot]]
+            self.samples[value] = count
 
 class DateParser:
-    def __init__(self):
+    def __init__(self, path: str | None = None, max_entries: int = 100_000, max_failed_dates: int = 100):
         self.dt_patterns = {
             "dddd":                             "%Y",
             "ddddsddsdd":                       "%Y{s0}%m{s1}%d",
@@ -32,57 +93,146 @@ class DateParser:
             "ddddsddsddwddsddsddsddddddsddsdd": "%Y{s0}%m{s1}%d %H{s2}%M{s3}%S{s4}%f%z",
         }
         self.dt_nulls = ["0000:00:00 00:00:00", "0000:01:01 00:00:00", "1980:00:00 00:00:00", "1980:01:01 00:00:00"]
-        self.summary = {dt_pattern: {"success": 0, "failed": 0, "null": 0, "failed_dates":[]} for dt_pattern in self.dt_patterns}
+        self.max_failed_dates = max_failed_dates
+        self.summary = {dt_pattern: self._new_entry() for dt_pattern in self.dt_patterns}
+        # raw date string -> [timestamp, chars pattern, outcome], least recently used strings are evicted past max_entries
+        self.path = path
+        self.max_entries = max_entries
+        self.parsed: OrderedDict[str, list] = OrderedDict()
 
-    def parse(self, date):
-        # Do not process nan values
-        if pd.isna(date):
-            return None
-        
-        date_str = str(date) if not isinstance(date, str) else date
+    def _new_entry(self) -> dict:
+        return {"success": 0, "failed": 0, "null": 0, "failed_dates": Reservoir(self.max_failed_dates)}
 
+    def load(self) -> None:
+        self.parsed = OrderedDict()
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            self.parsed.update(json.load(f))
+        self._evict()
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as f:
+            json.dump(self.parsed, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.parsed = OrderedDict()
+
+    def _evict(self) -> None:
+        while len(self.parsed) > self.max_entries:
+            self.parsed.popitem(last=False)
+
+    def _lookup(self, date_str: str) -> list | None:
+        result = self.parsed.get(date_str)
+        if result is not None:
+            self.parsed.move_to_end(date_str)
+        return result
+
+    def _tally(self, date_str: str, result: list, count: int) -> None:
+        _, chars_pattern, outcome = result
+        entry = self.summary.get(chars_pattern)
+        if entry is None:
+            entry = self.summary[chars_pattern] = self._new_entry()
+        entry[outcome] += count
+        if outcome == "failed":
+            entry["failed_dates"].add(date_str, count)
+
+    def _parse_str(self, date_str: str) -> list:
         # Parse the string into its structural character pattern and separators
         chars_pattern, sep_args = get_chars_pattern(date_str)
 
-        # Log unvalidated patterns and skip processing if the format is unrecognized
-        if chars_pattern not in self.dt_patterns:
-            self.summary[chars_pattern] = {"success": 0, "failed": 0, "null": 0, "failed_dates":[]}
-
         # Reject known null-equivalent or placeholder strings
         if date_str in self.dt_nulls:
-            self.summary[chars_pattern]["null"] += 1
-            return None
+            return [None, chars_pattern, "null"]
 
-        # Dynamically build the datetime format string and parse it into a Unix timestamp
+        # Dynamically build the datetime format string and parse it into a Unix timestamp, unrecognized patterns fail
         try:
             dt_strf = self.dt_patterns[chars_pattern].format(**sep_args)
-            timestamp = dt.datetime.strptime(date_str, dt_strf).timestamp()
-            self.summary[chars_pattern]["success"] += 1
-            return timestamp
+            return [dt.datetime.strptime(date_str, dt_strf).timestamp(), chars_pattern, "success"]
         except:
-            self.summary[chars_pattern]["failed_dates"].append(date_str)
-            self.summary[chars_pattern]["failed"] += 1
+            return [None, chars_pattern, "failed"]
+
+    def _parse_strs(self, date_strs: list[str]) -> list[list]:
+        # distinct strings grouped by pattern and separators, one to_datetime call per group
+        results = [None] * len(date_strs)
+        shapes, separators = get_chars_patterns(date_strs)
+        date_strs = pd.Series(date_strs, dtype=object)
+        nulls = date_strs.isin(self.dt_nulls).to_numpy()
+        for (chars_pattern, seps), group in pd.DataFrame({"shape": shapes, "seps": separators}).groupby(["shape", "seps"], sort=False).indices.items():
+            timestamps = np.full(len(group), np.nan)
+            if chars_pattern in self.dt_patterns:
+                dt_strf = self.dt_patterns[chars_pattern].format(**{f"s{i}": sep for i, sep in enumerate(seps)})
+                timestamps = to_timestamps(date_strs.iloc[group], dt_strf).to_numpy()
+            for pos, timestamp in zip(group, timestamps):
+                if nulls[pos]:
+                    results[pos] = [None, chars_pattern, "null"]
+                elif np.isnan(timestamp):
+                    results[pos] = [None, chars_pattern, "failed"]
+                else:
+                    results[pos] = [float(timestamp), chars_pattern, "success"]
+        return results
+
+    def parse(self, date):
+        # Do not process nan values
+        if pd.isna(date):
             return None
-    
+        
+        date_str = str(date) if not isinstance(date, str) else date
+        result = self._lookup(date_str)
+        if result is None:
+            result = self._parse_str(date_str)
+            self.parsed[date_str] = result
+            self._evict()
+        self._tally(date_str, result, 1)
+        return result[0]
+
+    def parse_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        # parse over whole columns: each distinct string is parsed once, and only if no earlier call has seen it
+        values = df.to_numpy(dtype=object).ravel()
+        present = ~pd.isna(values)
+        codes, uniques = pd.factorize(pd.Series([value if isinstance(value, str) else str(value) for value in values[present]], dtype=object))
+        counts = np.bincount(codes, minlength=len(uniques))
+
+        results = [self._lookup(date_str) for date_str in uniques]
+        missing = [pos for pos, result in enumerate(results) if result is None]
+        for pos, result in zip(missing, self._parse_strs([uniques[pos] for pos in missing])):
+            results[pos] = result
+            self.parsed[uniques[pos]] = result
+        self._evict()
+
+        for pos, (date_str, result) in enumerate(zip(uniques, results)):
+            self._tally(date_str, result, int(counts[pos]))
+
+        timestamps = np.array([np.nan if result[0] is None else result[0] for result in results], dtype=float)
+        out = np.full(len(values), np.nan)
+        out[present] = timestamps[codes]
+        return pd.DataFrame(out.reshape(df.shape), index=df.index, columns=df.columns)
+
     def get_summary(self):
-        return self.summary
-
-# def calc_partial_hash(path: str, hash_algo: str, parts: int, read_cap: int) -> dict:
-#     hash_func = getattr(hashlib, hash_algo)
-#     file_size = os.path.getsize(path)
-#     file_parts = file_size // parts
-#     # remainder = file_size % parts
-#     byte_steps = [file_parts * step for step in range(parts)]
-#     combined_hash = hash_func()
-#     try:
-#         with open(path, "rb") as f:
-#             for byte_step in byte_steps:
-#                 f.seek(byte_step, 0)
-#                 data = f.read(read_cap)
-#                 combined_hash.update(data)
-#         return {"hash": combined_hash.hexdigest()}
-#     except PermissionError:
-#         return {"hash": ""}
+        return {
+            chars_pattern: {**entry, "failed_dates": dict(entry["failed_dates"].samples)}
+            for chars_pattern, entry in self.summary.items()
+        }
+
+def calc_partial_hash(path: str, hash_algo: str = "md5", parts: int = 3, read_cap: int = 4096) -> str:
+    try:
+        hash_func = hashlib.new(hash_algo)
+        file_size = os.path.getsize(path)
+        file_parts = file_size // parts
+        byte_steps = [file_parts * step for step in range(parts)]
+        with open(path, "rb") as f:
+            for byte_step in byte_steps:
+                f.seek(byte_step, 0)
+                data = f.read(read_cap)
+                hash_func.update(data)
+        return hash_func.hexdigest()
+    except PermissionError:
+        return ""
     
 def calc_full_hash(path: str, hash_algo: str = "md5", buf_size: int = 65536) -> str:
     try:
@@ -96,4 +246,38 @@ def calc_full_hash(path: str, hash_algo: str = "md5", buf_size: int = 65536) ->
                 hash_func.update(data)
         return hash_func.hexdigest()
     except PermissionError:
-        return ""
\ No newline at end of file
+        return ""
+
+def calc_full_hashes(df: pd.DataFrame, scheduler, hash_algo: str = "md5", buf_size: int = 65536) -> pd.Series:
+    # df holds FilePath with optional InodeDev/Inode, files are read in on-disk order per device
+    hashes = scheduler.map(
+        calc_full_hash,
+        df[Cols.FILE_PATH].to_list(),
+        devs=df[Cols.INODE_DEV].to_list() if Cols.INODE_DEV in df.columns else None,
+        inos=df[Cols.INODE].to_list() if Cols.INODE in df.columns else None,
+        hash_algo=hash_algo,
+        buf_size=buf_size
+    )
+    return pd.Series(hashes, index=df.index, dtype=object)
+
+def copy_with_hash(src_path: str, dest_path: str, hash_algo: str = "md5", expected_hash: str | None = None, verify: bool = False, buf_size: int = 1048576) -> str:
+    # single read of the source: the digest is computed while the data is streamed to the destination
+    hash_func = hashlib.new(hash_algo)
+    created = False
+    try:
+        with open(src_path, "rb") as src, open(dest_path, "xb") as dest:
+            created = True
+            while data := src.read(buf_size):
+                hash_func.update(data)
+                dest.write(data)
+        shutil.copystat(src_path, dest_path)
+        digest = hash_func.hexdigest()
+        if expected_hash and digest != expected_hash:
+            raise RuntimeError("Source hash mismatch")
+        if verify and calc_full_hash(dest_path, hash_algo, buf_size) != digest:
+            raise RuntimeError("Destination hash mismatch")
+        return digest
+    except BaseException:
+        if created and os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
\ No newline at end of file
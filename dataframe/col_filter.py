@@ -1,10 +1,16 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
 import pandas as pd
-from typing import Iterator
+import re
+from typing import Callable, Iterator
 from dataframe.context import Context
 import warnings
 
+SCHEMA_CACHE_SIZE = 64
+SEPARATOR = "\0"
+
 def match_keywords(items: list[str], keywords: list[str]) -> Iterator[tuple[str, str]]:
     for kw in keywords:
         lk = kw.lower()
@@ -12,6 +18,62 @@ def match_keywords(items: list[str], keywords: list[str]) -> Iterator[tuple[str,
             if lk in i.lower():
                 yield kw, i
 
+@dataclass
+class ColumnIndex:
+    # column names lowered once and joined into one string, keyword lookups are a single regex scan over it
+    columns: pd.Index
+    names: dict[str, int] = field(init=False)
+    lowered: list[str] = field(init=False, repr=False)
+    text: str = field(init=False, repr=False)
+    offsets: list[int] = field(init=False, repr=False)
+    resolved: dict = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self.names = {col: pos for pos, col in enumerate(self.columns)}
+        self.lowered = [str(col).lower() for col in self.columns]
+        self.offsets, offset = [], 0
+        for name in self.lowered:
+            self.offsets.append(offset)
+            offset += len(name) + len(SEPARATOR)
+        self.text = SEPARATOR.join(self.lowered)
+
+    def resolve(self, key, func: Callable[["ColumnIndex"], list[str]]) -> list[str]:
+        # filter resolutions only depend on the schema, they are computed once per index
+        if key not in self.resolved:
+            self.resolved[key] = func(self)
+        return self.resolved[key]
+
+    def match(self, keywords: list[str]) -> list[str]:
+        lowered = [kw.lower() for kw in keywords]
+        if not lowered:
+            return []
+        if "" in lowered:
+            matched = range(len(self.lowered))
+        else:
+            pattern = re.compile("|".join(map(re.escape, lowered)))
+            matched = dict.fromkeys(bisect_right(self.offsets, m.start()) - 1 for m in pattern.finditer(self.text))
+        # keyword order first, then column order, as match_keywords yields them
+        out = {}
+        for kw in lowered:
+            for pos in matched:
+                if kw in self.lowered[pos]:
+                    out.setdefault(self.columns[pos], None)
+        return list(out)
+
+SCHEMAS: OrderedDict[int, ColumnIndex] = OrderedDict()
+
+def column_index(df: pd.DataFrame) -> ColumnIndex:
+    # an index is reused for as long as the frame keeps the same columns object, adding a column replaces it
+    columns = df.columns
+    index = SCHEMAS.get(id(columns))
+    if index is None or index.columns is not columns:
+        index = ColumnIndex(columns)
+        SCHEMAS[id(columns)] = index
+        if len(SCHEMAS) > SCHEMA_CACHE_SIZE:
+            SCHEMAS.popitem(last=False)
+    SCHEMAS.move_to_end(id(columns))
+    return index
+
 @dataclass
 class ColFilter(ABC):
     
@@ -31,14 +93,18 @@ class NameFilter(ColFilter):
             self.cols = [self.cols]
 
     def select(self, df: pd.DataFrame, ctx: Context) -> list[str]:
+        return list(column_index(df).resolve(("names", tuple(self.cols)), self._resolve))
+
+    def _resolve(self, index: ColumnIndex) -> list[str]:
         selected, missing = [], []
 
         for col in self.cols:
-            if col in df.columns:
+            if col in index.names:
                 selected.append(col)
             else:
                 missing.append(col)
 
+        # resolved once per schema, so missing columns are reported once too
         if missing:
             warnings.warn(f"NameFilter: columns not in DataFrame: {missing}")
 
@@ -53,34 +119,29 @@ class KeywordFilter(ColFilter):
             self.keywords = [self.keywords]
     
     def select(self, df: pd.DataFrame, ctx: Context) -> list[str]:
-        seen, out = set(), []
-        for _, col in match_keywords(df.columns, self.keywords):
-            if col not in seen:
-                seen.add(col)
-                out.append(col)
-        return out
+        keywords = tuple(self.keywords)
+        return list(column_index(df).resolve(("keywords", keywords), lambda index: index.match(list(keywords))))
 
 @dataclass
 class TagFilter(ColFilter):
     tags: list[str] | str
 
     def select(self, df: pd.DataFrame, ctx: Context) -> list[str]:
-        return [col for col in ctx.store.find_items(self.tags) if col in df.columns]
+        names = column_index(df).names
+        return [col for col in ctx.store.find_items(self.tags) if col in names]
 
 @dataclass
 class CombinedFilter(ColFilter):
     filters: list[ColFilter]
 
     def select(self, df: pd.DataFrame, ctx: Context) -> list[str]:
-        selected = []
+        selected = {}
         for filter in self.filters:
-            for col in filter.select(df, ctx):
-                if col not in selected:
-                    selected.append(col)
+            selected.update(dict.fromkeys(filter.select(df, ctx)))
 
         # return all if nothing selected
 
-        return selected
+        return list(selected)
 
 @dataclass
 class AllCols(ColFilter):
@@ -1,10 +1,24 @@
 from dataclasses import dataclass, field
+from functools import cached_property
 from dataframe.tag_store import TagStore
 from core.transformation import DateParser
-from typing import Any
+from core.scheduler import IOScheduler
+from dataframe.memo import MemoStore
+from typing import Any, Callable
 
 @dataclass
 class Context:
     store: TagStore = field(default_factory=TagStore)
-    parser: DateParser | None = None
-    geocoder: Any | None = None
\ No newline at end of file
+    parser_factory: Callable[[], DateParser] | None = None
+    geocoder_factory: Callable[[], Any] | None = None
+    scheduler: IOScheduler = field(default_factory=IOScheduler)
+    memo: MemoStore | None = None
+
+    # built on first use, runs that never parse dates or geocode never pay for them
+    @cached_property
+    def parser(self) -> DateParser | None:
+        return self.parser_factory() if self.parser_factory is not None else None
+
+    @cached_property
+    def geocoder(self) -> Any | None:
+        return self.geocoder_factory() if self.geocoder_factory is not None else None
\ No newline at end of file
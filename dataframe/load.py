@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
+import json
 import pandas as pd
 
 class Loader(ABC):
@@ -13,4 +14,8 @@ class JSONLoader(Loader):
     orient: str
 
     def load(self, path: str) -> pd.DataFrame:
-        return pd.read_json(path, orient=self.orient)
\ No newline at end of file
+        return pd.read_json(path, orient=self.orient)
+
+    def load_records(self, path: str) -> dict:
+        with open(path, mode="r", encoding="utf-8") as f:
+            return json.load(f)
\ No newline at end of file
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import json
+import os
+import pandas as pd
+from typing import Callable
+
+def stable_repr(value) -> str:
+    # objects without their own repr print their address, they are identified by type instead
+    if type(value).__repr__ is object.__repr__:
+        return type(value).__qualname__
+    return repr(value)
+
+def func_identity(func: Callable) -> str:
+    return f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', stable_repr(func))}"
+
+@dataclass
+class MemoStore:
+    # step identity -> {row hash of the inputs: output values}, least recently used rows are evicted past max_entries
+    # outputs are persisted as JSON, only steps returning JSON values (numbers, strings, lists, None) should opt in
+    path: str | None = None
+    max_entries: int = 1_000_000
+    tables: dict[str, OrderedDict] = field(default_factory=dict, repr=False)
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+
+    def load(self) -> None:
+        self.tables, self.size = {}, 0
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            stored = json.load(f)
+        for key, rows in stored.items():
+            self.tables[key] = OrderedDict((int(row_hash), values) for row_hash, values in rows)
+            self.size += len(rows)
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as f:
+            json.dump({key: [[str(row_hash), values] for row_hash, values in table.items()] for key, table in self.tables.items()}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        self.tables, self.size = {}, 0
+
+    def _evict(self) -> None:
+        # the oldest row of the largest table goes first
+        while self.size > self.max_entries:
+            table = max(self.tables.values(), key=len)
+            table.popitem(last=False)
+            self.size -= 1
+
+    def compute(self, key: str, inputs: pd.DataFrame, func: Callable, out_cols: list[str]) -> pd.DataFrame:
+        table = self.tables.setdefault(key, OrderedDict())
+        row_hashes = [int(row_hash) for row_hash in pd.util.hash_pandas_object(inputs, index=False)]
+        known = [row_hash in table for row_hash in row_hashes]
+        missing = [pos for pos, hit in enumerate(known) if not hit]
+
+        if missing:
+            computed = func(inputs.iloc[missing])
+            computed = computed.to_frame() if isinstance(computed, pd.Series) else computed
+            # to_json turns numpy scalars and NaN into plain JSON values, as they will be read back
+            for pos, values in zip(missing, json.loads(computed.to_json(orient="values", force_ascii=False))):
+                if row_hashes[pos] not in table:
+                    self.size += 1
+                table[row_hashes[pos]] = values
+
+        rows = []
+        for row_hash in row_hashes:
+            table.move_to_end(row_hash)
+            rows.append(table[row_hash])
+        self.hits += len(row_hashes) - len(missing)
+        self.misses += len(missing)
+        self._evict()
+        return pd.DataFrame(rows, index=inputs.index, columns=out_cols, dtype=object)
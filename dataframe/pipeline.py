@@ -1,11 +1,50 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
+import numpy as np
 import pandas as pd
+from typing import Literal
+import warnings
 from dataframe.context import Context
 from dataframe.col_filter import ColFilter
+from dataframe.memo import func_identity, stable_repr
 from dataframe.processor import Processor
+from dataframe.profiler import active_profiler, observe_mask
 from dataframe.predicate import Predicate
 
+def as_values(result: pd.DataFrame | pd.Series) -> pd.DataFrame | pd.Series:
+    # a single output column is taken as a Series, squeeze() would turn a one row result into a scalar
+    if isinstance(result, pd.DataFrame) and len(result.columns) == 1:
+        return result.iloc[:, 0]
+    return result
+
+def cast_values(values: pd.Series, dtype: str, col: str) -> pd.Series:
+    try:
+        return values.astype(dtype)
+    except (TypeError, ValueError) as e:
+        warnings.warn(f"Compute: {col} kept as {values.dtype}, values do not fit {dtype}: {e}")
+        return values
+
+def assign_result(df: pd.DataFrame, dest_col: str, values: pd.Series, mask: pd.Series, dtype: str | None = None) -> None:
+    # the column is built once and assigned whole: results on the masked rows, the existing values elsewhere
+    if dtype is None:
+        # undeclared outputs keep the object column, rows a new column has no result for are None
+        column = df[dest_col].to_numpy(dtype=object, copy=True) if dest_col in df.columns else np.full(len(df.index), None, dtype=object)
+        rows = mask.to_numpy(dtype=bool)
+        column[rows] = values.reindex(df.index[rows]).to_numpy(dtype=object)
+        df[dest_col] = pd.Series(column, index=df.index, dtype=object)
+        return
+
+    # declared outputs are built from the result in their dtype, rows outside the mask are NA
+    values = cast_values(values, dtype, dest_col)
+    if dest_col not in df.columns or mask.all():
+        df[dest_col] = values.reindex(df.index)
+        return
+    existing = cast_values(df[dest_col], dtype, dest_col)
+    if isinstance(existing.dtype, pd.CategoricalDtype):
+        df[dest_col] = existing.astype(object).mask(mask, values.astype(object).reindex(df.index)).astype(dtype)
+        return
+    df[dest_col] = existing.mask(mask, values.reindex(df.index))
+
 @dataclass
 class Step(ABC):
     @abstractmethod
@@ -39,6 +78,7 @@ class FilterRows(Step):
 
     def run(self, df: pd.DataFrame, ctx: Context) -> pd.DataFrame:
         mask = self.predicate.apply(df)
+        observe_mask(mask)
         return df[mask]
 
 # Transform
@@ -68,23 +108,40 @@ class Compute(Step):
     col_filter: ColFilter
     dest_col: str | None = None
     where: Predicate | None = None
+    parallel: Literal["thread", "process"] | None = None
+    max_workers: int | None = None
+    memo: bool = False
+    dtype: str | None = None            # pandas dtype of dest_col, e.g. "Int64", "boolean", "str", "category"
+
+    def identity(self, cols: list[str]) -> str:
+        # the same function, arguments, inputs and output across runs, whichever pipeline the step was built in
+        kwargs = ",".join(f"{name}={stable_repr(value)}" for name, value in sorted(self.processor.kwargs.items()))
+        return f"{type(self.processor).__name__}:{func_identity(self.processor.func)}({kwargs}):{cols}->{self.dest_col}"
+
+    def process(self, inputs: pd.DataFrame) -> pd.DataFrame | pd.Series:
+        if self.parallel is None:
+            return self.processor.process(inputs)
+        return self.processor.process_parallel(inputs, self.parallel, self.max_workers)
 
     def run(self, df: pd.DataFrame, ctx: Context):
         cols = self.col_filter.select(df, ctx)
-        # update values in tag store if available
-        if ctx.store is not None:
+        # update values in tag store if available, in place results are not new columns
+        if ctx.store is not None and self.dest_col is not None:
             ctx.store.assign_tags(self.dest_col, "new")
         # init Series[bool] for row filtering
         mask = self.where.apply(df) if self.where else pd.Series(True, index=df.index)
+        observe_mask(mask)
         # execute calculation
-        result = self.processor.process(df.loc[mask, cols])
+        if self.memo and ctx.memo is not None:
+            # only rows whose inputs were not seen by an earlier run are processed
+            out_cols = [self.dest_col] if self.dest_col else cols
+            result = ctx.memo.compute(self.identity(cols), df.loc[mask, cols], self.process, out_cols)
+        else:
+            result = self.process(df.loc[mask, cols])
         # print(f"Processor{type(self.processor).__name__} Incoming{type(df.loc[mask, cols])}, Outcoming{type(result)}")
         # assign results
         if self.dest_col:
-            if self.dest_col not in df.columns:
-                df[self.dest_col] = None
-            df.loc[mask, self.dest_col] = result.squeeze() # dtype misalignment issue
-            # df[self.dest_col] = result.reindex(df.index, fill_value=None)
+            assign_result(df, self.dest_col, as_values(result), mask, self.dtype)
         else:
             df[cols] = None
             df.loc[mask, cols] = result
@@ -95,8 +152,15 @@ class Compute(Step):
 class Pipeline:
     steps: list[Step]
     context: Context = field(default_factory=Context)
+    name: str | None = None
 
     def execute(self, df: pd.DataFrame) -> pd.DataFrame:
-        for step in self.steps:
-            df = step.run(df, self.context)
+        profiler = active_profiler()
+        if profiler is None:
+            for step in self.steps:
+                df = step.run(df, self.context)
+            return df
+        with profiler.pipeline(self.name or type(self).__name__):
+            for step in self.steps:
+                df = profiler.run_step(step, df, self.context)
         return df
\ No newline at end of file
@@ -0,0 +1,203 @@
+from dataclasses import dataclass, field, replace
+import pandas as pd
+from dataframe.context import Context
+from dataframe.col_filter import ColFilter, NameFilter
+from dataframe.pipeline import Pipeline, Step, AssignTags, FilterRows, Compute, assign_result
+from dataframe.processor import ElementProcessor
+from dataframe.predicate import Predicate
+from dataframe.profiler import observe_mask
+
+# None stands for "unknown", the planner then assumes every column is involved
+
+def filter_cols(col_filter: ColFilter) -> set[str] | None:
+    # only a NameFilter selects the same columns whatever the frame and tag store hold
+    return set(col_filter.cols) if isinstance(col_filter, NameFilter) else None
+
+def step_reads(step: Step) -> set[str] | None:
+    match step:
+        case Compute():
+            cols = filter_cols(step.col_filter)
+            where = step.where.reads() if step.where is not None else set()
+            return None if cols is None or where is None else cols | where
+        case FilterRows():
+            return step.predicate.reads()
+        case FusedCompute():
+            return step_reads(step.steps[0])
+        case InvalidateMasks():
+            return set()
+    return None
+
+def step_writes(step: Step) -> set[str] | None:
+    match step:
+        case Compute():
+            return {step.dest_col} if step.dest_col else filter_cols(step.col_filter)
+        case FusedCompute():
+            return {fused.dest_col for fused in step.steps}
+        case AssignTags() | InvalidateMasks():
+            return set()
+    return None
+
+@dataclass
+class MaskCache:
+    # masks are only reused on the frame they were computed for, a row filter produces a new index and misses
+    masks: dict[str, tuple[pd.Index, pd.Series]] = field(default_factory=dict)
+    reads: dict[str, set[str] | None] = field(default_factory=dict)
+
+    def get(self, key: str, predicate: Predicate, df: pd.DataFrame) -> pd.Series:
+        cached = self.masks.get(key)
+        if cached is not None and cached[0] is df.index:
+            return cached[1]
+        mask = predicate.apply(df)
+        self.masks[key] = (df.index, mask)
+        return mask
+
+    def invalidate(self, cols: set[str] | None) -> None:
+        for key, reads in self.reads.items():
+            if cols is None or reads is None or reads & cols:
+                self.masks.pop(key, None)
+
+@dataclass
+class CachedPredicate(Predicate):
+    predicate: Predicate
+    cache: MaskCache = field(repr=False)
+
+    def reads(self) -> set[str] | None:
+        return self.predicate.reads()
+
+    def apply(self, df: pd.DataFrame) -> pd.Series:
+        return self.cache.get(repr(self.predicate), self.predicate, df)
+
+@dataclass
+class InvalidateMasks(Step):
+    cache: MaskCache = field(repr=False)
+    cols: set[str] | None
+
+    def run(self, df: pd.DataFrame, ctx: Context) -> pd.DataFrame:
+        self.cache.invalidate(self.cols)
+        return df
+
+@dataclass
+class FusedCompute(Step):
+    # element-wise steps over the same column and rows, evaluated in one pass over the values
+    steps: list[Compute]
+
+    def run(self, df: pd.DataFrame, ctx: Context) -> pd.DataFrame:
+        first = self.steps[0]
+        cols = first.col_filter.select(df, ctx)
+        if not cols:
+            for step in self.steps:
+                df = step.run(df, ctx)
+            return df
+
+        if ctx.store is not None:
+            for step in self.steps:
+                ctx.store.assign_tags(step.dest_col, "new")
+        mask = first.where.apply(df) if first.where else pd.Series(True, index=df.index)
+        observe_mask(mask)
+        values = df.loc[mask, cols[0]]
+        funcs = [(step.processor.func, step.processor.kwargs) for step in self.steps]
+        results = [tuple(func(value, **kwargs) for func, kwargs in funcs) for value in values]
+
+        for i, step in enumerate(self.steps):
+            assign_result(df, step.dest_col, pd.Series([result[i] for result in results], index=values.index), mask, step.dtype)
+        return df
+
+def eliminate_dead_steps(steps: list[Step], outputs: list[str]) -> list[Step]:
+    # walk backwards keeping a step only if something after it, or the caller, reads what it writes
+    live = set(outputs)
+    kept = []
+    for step in reversed(steps):
+        writes = step_writes(step)
+        if isinstance(step, Compute) and live is not None and writes is not None and not writes & live:
+            continue
+        kept.append(step)
+        reads = step_reads(step)
+        live = None if live is None or reads is None else live | reads
+    return kept[::-1]
+
+def is_fusable(step: Step) -> bool:
+    return (
+        type(step) is Compute
+        and step.parallel is None
+        and not step.memo
+        and type(step.processor) is ElementProcessor
+        and step.dest_col is not None
+        and isinstance(step.col_filter, NameFilter)
+        and len(step.col_filter.cols) == 1
+        and (step.where is None or step.where.reads() is not None)
+    )
+
+def fuse_element_steps(steps: list[Step]) -> list[Step]:
+    fused, group = [], []
+
+    def flush() -> None:
+        if len(group) > 1:
+            fused.append(FusedCompute(list(group)))
+        else:
+            fused.extend(group)
+        group.clear()
+
+    for step in steps:
+        if group and is_fusable(step):
+            first = group[0]
+            inputs = set(first.col_filter.cols) | (first.where.reads() if first.where is not None else set())
+            written = {member.dest_col for member in group}
+            if step.col_filter == first.col_filter and step.where == first.where and step.dest_col not in written | inputs and not written & inputs:
+                group.append(step)
+                continue
+        flush()
+        if is_fusable(step):
+            group.append(step)
+        else:
+            fused.append(step)
+    flush()
+    return fused
+
+def share_masks(steps: list[Step]) -> list[Step]:
+    # predicates used by more than one step are evaluated once and invalidated when a step writes what they read
+    def predicate_of(step: Step) -> Predicate | None:
+        match step:
+            case Compute() | FusedCompute():
+                return (step.steps[0] if isinstance(step, FusedCompute) else step).where
+            case FilterRows():
+                return step.predicate
+        return None
+
+    counts, reads = {}, {}
+    for step in steps:
+        predicate = predicate_of(step)
+        if predicate is not None:
+            counts[repr(predicate)] = counts.get(repr(predicate), 0) + 1
+            reads[repr(predicate)] = predicate.reads()
+
+    cache = MaskCache(reads={key: reads[key] for key, count in counts.items() if count > 1})
+    if not cache.reads:
+        return steps
+
+    # masks only live for one execute, a later frame may come with the same index object but other values
+    shared = [InvalidateMasks(cache, None)]
+    for step in steps:
+        predicate = predicate_of(step)
+        if predicate is not None and repr(predicate) in cache.reads:
+            cached = CachedPredicate(predicate, cache)
+            match step:
+                case FusedCompute():
+                    step = FusedCompute([replace(member, where=cached) for member in step.steps])
+                case Compute():
+                    step = replace(step, where=cached)
+                case FilterRows():
+                    step = replace(step, predicate=cached)
+        shared.append(step)
+        writes = step_writes(step)
+        if writes is None or any(reads is None or reads & writes for reads in cache.reads.values()):
+            shared.append(InvalidateMasks(cache, writes))
+    return shared
+
+def optimize(pipeline: Pipeline, outputs: list[str] | None = None) -> Pipeline:
+    # without declared outputs every column the pipeline writes is assumed to be read by the caller
+    steps = pipeline.steps
+    if outputs is not None:
+        steps = eliminate_dead_steps(steps, outputs)
+    steps = fuse_element_steps(steps)
+    steps = share_masks(steps)
+    return Pipeline(steps, context=pipeline.context, name=pipeline.name)
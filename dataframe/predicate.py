@@ -10,23 +10,44 @@ class Predicate(ABC):
     def apply(self, df: pd.DataFrame) -> pd.Series:
         raise NotImplementedError
 
+    def reads(self) -> set[str] | None:
+        # columns the mask depends on, None when unknown
+        return None
+
+def combine_reads(predicates: list[Predicate]) -> set[str] | None:
+    cols = set()
+    for predicate in predicates:
+        reads = predicate.reads()
+        if reads is None:
+            return None
+        cols |= reads
+    return cols
+
 @dataclass
 class Condition(Predicate):
     col: str
     comparator: Literal["eq", "ne", "lt", "le", "gt", "ge", "isna", "notna"]
     val: object = None
 
+    def reads(self) -> set[str] | None:
+        return {self.col}
+
     def apply(self, df: pd.DataFrame) -> pd.Series:
         if self.comparator == "isna":
             return df[self.col].isna()
         if self.comparator == "notna":
             return df[self.col].notna()
-        return getattr(operator, self.comparator)(df[self.col], self.val)
+        mask = getattr(operator, self.comparator)(df[self.col], self.val)
+        # comparisons on nullable columns are NA where the value is, such rows do not match
+        return mask.fillna(False).astype(bool) if isinstance(mask.dtype, pd.BooleanDtype) else mask
 
 @dataclass
 class Or(Predicate):
     conditions: list[Predicate]
 
+    def reads(self) -> set[str] | None:
+        return combine_reads(self.conditions)
+
     def apply(self, df: pd.DataFrame) -> pd.Series:
         mask = pd.Series(False, index=df.index) # identity for OR
         for cond in self.conditions:
@@ -37,6 +58,9 @@ class Or(Predicate):
 class And(Predicate):
     conditions: list[Predicate]
 
+    def reads(self) -> set[str] | None:
+        return combine_reads(self.conditions)
+
     def apply(self, df: pd.DataFrame) -> pd.Series:
         mask = pd.Series(True, index=df.index) # identity for AND
         for cond in self.conditions:
@@ -46,5 +70,8 @@ class And(Predicate):
 @dataclass
 class AllRows(Predicate):
 
+    def reads(self) -> set[str] | None:
+        return set()
+
     def apply(self, df: pd.DataFrame) -> pd.Series:
         return pd.Series(True, index=df.index)
\ No newline at end of file
@@ -1,7 +1,12 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
+import numpy as np
+import os
 import pandas as pd
-from typing import Callable
+from typing import Callable, Literal
+
+CHUNKS_PER_WORKER = 4
 
 @dataclass(init=False)
 class Processor(ABC):
@@ -15,6 +20,20 @@ class Processor(ABC):
     @abstractmethod
     def process(self, df: pd.DataFrame) -> pd.DataFrame:
         raise NotImplementedError
+
+    def process_parallel(self, df: pd.DataFrame, parallel: Literal["thread", "process"], max_workers: int | None = None) -> pd.DataFrame | pd.Series:
+        # threads for functions waiting on I/O, processes for pure Python work; func and its kwargs have to pickle for processes
+        # the frame is cut into contiguous chunks so concatenating the results in submission order restores the index order
+        workers = max_workers or os.cpu_count() or 1
+        n_chunks = min(len(df.index), workers * CHUNKS_PER_WORKER)
+        if workers == 1 or n_chunks <= 1:
+            return self.process(df)
+        bounds = np.linspace(0, len(df.index), n_chunks + 1, dtype=int)
+        chunks = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        executor_cls = ThreadPoolExecutor if parallel == "thread" else ProcessPoolExecutor
+        with executor_cls(max_workers=workers) as executor:
+            results = list(executor.map(self.process, chunks))
+        return pd.concat(results)
     
 @dataclass(init=False)
 class ElementProcessor(Processor):
@@ -41,4 +60,15 @@ class ColProcessor(Processor):
         # if isinstance(result, pd.Series):
         #     return result.to_frame()
 
-        return result
\ No newline at end of file
+        return result
+
+@dataclass(init=False)
+class VectorProcessor(Processor):
+    # func works on whole columns (str accessors, np.where) and returns one value per row
+    def process(self, df: pd.DataFrame) -> pd.Series:
+        if df.empty:
+            return pd.Series(index=df.index, dtype=object)
+        result = self.func(df, **self.kwargs)
+        if isinstance(result, pd.Series):
+            return result
+        return pd.Series(np.asarray(result, dtype=object), index=df.index)
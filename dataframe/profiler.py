@@ -0,0 +1,133 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+import json
+import os
+import pandas as pd
+import time
+from typing import Iterator
+
+ACTIVE: ContextVar["Profiler | None"] = ContextVar("profiler", default=None)
+
+def active_profiler() -> "Profiler | None":
+    return ACTIVE.get()
+
+def observe_mask(mask: pd.Series) -> None:
+    # called by steps that filter rows, a no-op unless a profiler is active
+    profiler = ACTIVE.get()
+    if profiler is not None:
+        profiler.observe_mask(mask)
+
+def describe_step(step) -> tuple[str, str | None]:
+    processor = getattr(step, "processor", None)
+    if processor is not None:
+        func = getattr(processor.func, "__name__", type(processor.func).__name__)
+        target = getattr(step, "dest_col", None) or "in place"
+        return f"{type(step).__name__}[{func}->{target}]", type(processor).__name__
+    fused = getattr(step, "steps", None)
+    if fused is not None:
+        return f"{type(step).__name__}[{','.join(str(member.dest_col) for member in fused)}]", type(fused[0].processor).__name__
+    return type(step).__name__, None
+
+def frame_memory(df: pd.DataFrame, deep: bool) -> int:
+    return int(df.memory_usage(index=True, deep=deep).sum())
+
+@dataclass
+class StepRecord:
+    pipeline: str
+    step: str
+    processor: str | None
+    rows_in: int
+    rows_out: int = 0
+    rows_selected: int | None = None
+    seconds: float = 0.0
+    memory_delta: int = 0
+
+    @property
+    def selectivity(self) -> float | None:
+        if self.rows_selected is None or not self.rows_in:
+            return None
+        return self.rows_selected / self.rows_in
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "selectivity": self.selectivity}
+
+@dataclass
+class Profiler:
+    # records every step run by any Pipeline while active: with Profiler() as profiler: ...
+    deep_memory: bool = False           # deep memory_usage inspects every object value, accurate but slow
+    records: list[StepRecord] = field(default_factory=list)
+    stack: list[str] = field(default_factory=list, repr=False)
+    current: StepRecord | None = field(default=None, repr=False)
+    token: object = field(default=None, repr=False)
+
+    def __enter__(self) -> "Profiler":
+        self.token = ACTIVE.set(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        ACTIVE.reset(self.token)
+        self.token = None
+
+    @contextmanager
+    def pipeline(self, name: str) -> Iterator[None]:
+        self.stack.append(name)
+        try:
+            yield
+        finally:
+            self.stack.pop()
+
+    def run_step(self, step, df: pd.DataFrame, ctx) -> pd.DataFrame:
+        label, processor = describe_step(step)
+        record = StepRecord(pipeline=";".join(self.stack), step=label, processor=processor, rows_in=len(df.index))
+        outer, self.current = self.current, record
+        memory = frame_memory(df, self.deep_memory)
+        start = time.perf_counter()
+        try:
+            df = step.run(df, ctx)
+        finally:
+            record.seconds = time.perf_counter() - start
+            self.current = outer
+            self.records.append(record)
+        record.rows_out = len(df.index)
+        record.memory_delta = frame_memory(df, self.deep_memory) - memory
+        return df
+
+    def observe_mask(self, mask: pd.Series) -> None:
+        if self.current is not None:
+            self.current.rows_selected = int(mask.sum())
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([record.to_dict() for record in self.records])
+
+    def save_json(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, mode="w", encoding="utf-8") as f:
+            json.dump([record.to_dict() for record in self.records], f, indent=4, ensure_ascii=False)
+
+    def folded(self) -> list[str]:
+        # folded stacks (pipeline;step microseconds), readable by flamegraph.pl and speedscope
+        totals = {}
+        for record in self.records:
+            stack = f"{record.pipeline};{record.step}" if record.pipeline else record.step
+            totals[stack] = totals.get(stack, 0) + record.seconds
+        return [f"{stack} {round(seconds * 1e6)}" for stack, seconds in totals.items()]
+
+    def save_folded(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, mode="w", encoding="utf-8") as f:
+            f.write("\n".join(self.folded()) + "\n")
+
+    def summary(self, top: int = 20) -> str:
+        if not self.records:
+            return "No steps recorded"
+        df = self.to_frame()
+        grouped = df.groupby(["pipeline", "step"], sort=False).agg(
+            calls=("seconds", "size"),
+            seconds=("seconds", "sum"),
+            rows_in=("rows_in", "sum"),
+            rows_out=("rows_out", "sum"),
+            memory_delta=("memory_delta", "sum"),
+        )
+        grouped["share"] = (grouped["seconds"] / grouped["seconds"].sum()).round(3)
+        return grouped.sort_values("seconds", ascending=False).head(top).to_string()
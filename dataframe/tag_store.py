@@ -1,31 +1,46 @@
 class TagStore:
     def __init__(self):
         self.tagged_items: dict[str, set] = {}
+        self.items_by_tag: dict[str, set] = {}
+        # sorted find_items results, dropped whenever a tag is assigned or renamed
+        self._views: dict[frozenset, list[str]] = {}
 
     @property
     def assigned_tags(self) -> set:
-        if not self.tagged_items:
-            return set()
-        return set().union(*self.tagged_items.values())
+        return set(self.items_by_tag)
+
+    def has_tag(self, tag: str) -> bool:
+        return tag in self.items_by_tag
 
     def assign_tags(self, item: str, tags: list[str] | str):
         if isinstance(tags, str):
             tags = [tags]
+        item_tags = self.tagged_items.setdefault(item, set())
         for tag in tags:
-            self.tagged_items.setdefault(item, set()).add(tag)
+            if tag not in item_tags:
+                item_tags.add(tag)
+                self.items_by_tag.setdefault(tag, set()).add(item)
+                self._views.clear()
         return self
     
     def rename_tag(self, old_tag: str, new_tag: str):
-        if old_tag not in self.assigned_tags:
+        if old_tag not in self.items_by_tag:
             raise ValueError(f"Provided tag {old_tag} does not exist")
-        for tags in self.tagged_items.values():
-            if old_tag in tags:
-                tags.remove(old_tag)
-                tags.add(new_tag)
+        items = self.items_by_tag.pop(old_tag)
+        for item in items:
+            tags = self.tagged_items[item]
+            tags.remove(old_tag)
+            tags.add(new_tag)
+        self.items_by_tag.setdefault(new_tag, set()).update(items)
+        self._views.clear()
         return self
 
     def find_items(self, tags: list[str] | str) -> list[str]:
         if isinstance(tags, str):
             tags = [tags]
-        wanted = set(tags)
-        return sorted([item for item, item_tags in self.tagged_items.items() if wanted.intersection(item_tags)])
\ No newline at end of file
+        wanted = frozenset(tags)
+        view = self._views.get(wanted)
+        if view is None:
+            view = sorted(set().union(*(self.items_by_tag.get(tag, ()) for tag in wanted)))
+            self._views[wanted] = view
+        return list(view)
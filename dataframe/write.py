@@ -34,8 +34,14 @@ class JSONWriter(Writer):
         # create dir if not exists
         os.makedirs(os.path.dirname(path), exist_ok=True)
         if dropna:
-            payload = {str(row_id): row.dropna().to_dict() for row_id, row in df.iterrows()}
-            with open(path, mode="w", encoding="utf-8") as f:
-                json.dump(payload, f, indent=self.indent, ensure_ascii=self.force_ascii)
+            # serialise in C first, then drop nulls from plain dicts instead of iterating rows as Series
+            payload = json.loads(df.to_json(orient="index", force_ascii=False))
+            payload = {row_id: {col: value for col, value in row.items() if value is not None} for row_id, row in payload.items()}
+            self.save_records(payload, path)
         else:
-            df.to_json(path, orient=self.orient, indent=self.indent, force_ascii=self.force_ascii)
\ No newline at end of file
+            df.to_json(path, orient=self.orient, indent=self.indent, force_ascii=self.force_ascii)
+
+    def save_records(self, records: dict, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode="w", encoding="utf-8") as f:
+            json.dump(records, f, indent=self.indent, ensure_ascii=self.force_ascii)
\ No newline at end of file
@@ -1,27 +1,33 @@
 import pandas as pd
 from enum import StrEnum, auto
+from functools import partial
 from core.pipelines import dup_label_col, dest_col, prepare_dirs, add_depth_metrics, assemble_file_path, add_stat, tag_columns, select_columns, consolidate_file_ext, exclude_rows, assemble_dest_dir
 from cli.tokens import Icon, Separator
 from cli.components import Info, Prompt
 from core.transformation import DateParser
-from core.config import Config, Cache, Exif, Reference
+from core.cache import JSONCache, ContentJSONCache, SQLiteCache
+from core.config import Config, Exif, Reference
+from core.fileops import FileOpExecutor, copy, move
+from core.gc import RetentionPolicy, GCStats, collect_garbage
+from core.geocache import GeoCache, load_rgeocoder
+from core.index import ContentIndex, INDEX_COLS
+from core.journal import Journal
+from core.scheduler import IOScheduler
+from core.shard import ShardedCache, device_shard, migrate_flat_cache
 from constants import TagsMapping, Tags, Cols
 from dataframe.context import Context
+from dataframe.memo import MemoStore
+from dataframe.profiler import Profiler
 from dataframe.write import CSVWriter, JSONWriter
 from dataframe.load import JSONLoader
-from dotenv import load_dotenv
 from datetime import datetime
 import os
 import pandas as pd
-from reverse_geocoder import RGeocoder
 import shutil
-from tqdm import tqdm
 from typing import Callable
 from utils.path import iter_dir_tree, is_parent, depth_from_dir
 from utils.text import uppercase_text
 
-load_dotenv()
-
 ###############################
 ############ TO-DO ############
 ###############################
@@ -42,7 +48,13 @@ EXIFTOOL_EXECUTABLE = "exiftool"
 CACHE_DIR = "cache"
 CACHE_METADATA = "metadata.json"
 CACHE_REGISTER = "register.json"
-REGISTER_COLS = [Cols.FILE_PATH, Cols.FILE_NAME, Cols.MODIFIED_AT, Cols.SIZE, Cols.EXIF_ARGS]
+CACHE_INDEX = "index.json"
+CACHE_DB = "cache.sqlite"
+CACHE_SHARDS = "shards"
+CACHE_MEMO = "memo.json"
+CACHE_DATES = "dates.json"
+CACHE_GEO = "geo.json"
+REGISTER_COLS = [Cols.FILE_PATH, Cols.FILE_NAME, Cols.MODIFIED_AT, Cols.SIZE, Cols.EXIF_ARGS, Cols.SEEN_AT]
 
 class MenuActions(StrEnum):
     EXIT = auto()
@@ -53,6 +65,9 @@ class MenuActions(StrEnum):
     RESTART = auto()
 
 def find_exiftool() -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv()
     path = os.environ.get(EXIFTOOL_ENV_VAR) or shutil.which(EXIFTOOL_EXECUTABLE)
     if not path:
         raise RuntimeError("ExifTool not found")
@@ -142,31 +157,46 @@ def remove_dir(dir_path: str):
     except Exception as e:
         return f"ERROR - {e}"
 
-def move(src_path: str, dest_path: str):
-    try:
-        if os.path.exists(dest_path):
-            raise RuntimeError("Destination occupied")
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-        shutil.move(src_path, dest_path)
-        if os.path.exists(src_path):
-            raise RuntimeError("Source still exists")
-    except Exception as e:
-        return e
-
-def copy(src_path: str, dest_path: str):
-    try:
-        if os.path.exists(dest_path):
-            raise RuntimeError("Destination occupied")
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-        shutil.copy2(src_path, dest_path)
-    except Exception as e:
-        return e
+def persisted_stores(ctx: Context, dest_structure: list[str]) -> list:
+    # context members kept across runs next to the caches, all with load/clear/save
+    # the parser and geocoder are only built (and their stores read) when a layer needs them
+    stores = [ctx.memo]
+    if Cols.EARLIEST_YEAR in dest_structure:
+        stores.append(ctx.parser)
+    if Cols.IMAGE_COUNTRY in dest_structure and isinstance(ctx.geocoder, GeoCache):
+        stores.append(ctx.geocoder)
+    return stores
+
+def route_to_shards(caches: tuple, file_ids: pd.Series, devs: pd.Series) -> None:
+    routes = {file_id: device_shard(dev) for file_id, dev in zip(file_ids, devs) if pd.notna(file_id) and pd.notna(dev)}
+    for cache in caches:
+        if isinstance(cache, ShardedCache):
+            cache.assign(routes)
+
+def execute_operation(files_df: pd.DataFrame, operation: Callable, executor: FileOpExecutor, verify: bool = False) -> pd.DataFrame:
+    from tqdm import tqdm
+
+    with tqdm(total=len(files_df.index), desc=f"{f"{operation.__name__} files into new structure":<40}", bar_format=TQDM_BAR) as progress:
+        outcome = executor.run(
+            operation,
+            files_df[Cols.FILE_PATH].to_list(),
+            files_df[dest_col(Cols.FILE_PATH)].to_list(),
+            file_hashes=files_df[Cols.FILE_HASH].to_list() if Cols.FILE_HASH in files_df.columns else None,
+            src_devs=files_df[Cols.INODE_DEV].to_list() if Cols.INODE_DEV in files_df.columns else None,
+            sizes=files_df[Cols.SIZE].to_list() if Cols.SIZE in files_df.columns else None,
+            progress=progress.update,
+            verify=verify
+        )
+    files_df[operation.__name__] = [error for error, _ in outcome]
+    files_df[Cols.FILE_HASH] = [file_hash for _, file_hash in outcome]
+    return files_df
 
 ###############################
 ####### MAIN FUNCTIONS ########
 ###############################
 
-def restore(report_path: str, operation: Callable, config: Config) -> pd.DataFrame:
+def restore(report_path: str, operation: Callable, config: Config, verify: bool = False) -> pd.DataFrame:
+    from tqdm import tqdm
 
     if operation not in (copy, move):
         raise ValueError(f"Unknown operation: {operation.__name__}")
@@ -183,6 +213,10 @@ def restore(report_path: str, operation: Callable, config: Config) -> pd.DataFra
     for cache in (register, metadata):
         cache.load()
 
+    index = config.index
+    if index is not None:
+        index.load()
+
     files_df = pd.read_csv(report_path)[[dest_col(Cols.FILE_ID), dest_col(Cols.FILE_PATH), Cols.FILE_PATH]]
     # files_df = report_df[[dest_col(Cols.FILE_ID), dest_col(Cols.FILE_PATH), Cols.FILE_PATH]]
     files_df = files_df.rename(columns={
@@ -194,9 +228,9 @@ def restore(report_path: str, operation: Callable, config: Config) -> pd.DataFra
     if not files_df.empty:
 
         # Execute operation
-        tqdm.pandas(desc=f"{f"{operation.__name__} files into new structure":<40}", bar_format=TQDM_BAR)
-        files_df[operation.__name__] = files_df.progress_apply(lambda row: operation(row[Cols.FILE_PATH], row[dest_col(Cols.FILE_PATH)]), axis=1)
+        files_df = execute_operation(files_df, operation, config.fileops, verify=verify)
         files_df = add_stat(prefix="Dest", metrics=["dev", "ino", "id"]).execute(files_df)
+        route_to_shards((register, metadata), files_df[dest_col(Cols.FILE_ID)], files_df[dest_col(Cols.INODE_DEV)])
 
         # Remove emptied dirs
         if operation is move:
@@ -223,19 +257,25 @@ def restore(report_path: str, operation: Callable, config: Config) -> pd.DataFra
                 cache.update(chg_id)
                 if operation is move:
                     # drop stale cache entries
-                    cache.delete(chg_id[Cols.FILE_ID])
+                    cache.delete(list(src_to_dest))
 
         # Save cache
         register.save(dropna=False)
         metadata.save(dropna=True)
 
+        # Update content index, restored files leave the destination tree
+        if index is not None and operation is move:
+            index.delete(files_df.loc[files_df[operation.__name__].isna(), Cols.FILE_PATH])
+            index.save()
+
         return files_df
 
     else:
         print("Nothing to restore")
         return files_df
 
-def organise(src_roots: str | list[str], dest_root: str, dest_structure: list[str], operation: Callable, config: Config, clear_cache: bool = False) -> pd.DataFrame:
+def organise(src_roots: str | list[str], dest_root: str, dest_structure: list[str], operation: Callable, config: Config, clear_cache: bool = False, verify: bool = False, retention: RetentionPolicy | None = None) -> pd.DataFrame:
+    from tqdm import tqdm
 
     if operation not in (copy, move):
         raise ValueError(f"Unknown operation: {operation.__name__}")
@@ -246,19 +286,16 @@ def organise(src_roots: str | list[str], dest_root: str, dest_structure: list[st
         if response == "n":
             return pd.DataFrame()
 
-    # Load cache
-    register, metadata = config.register, config.metadata
-
-    for cache in (register, metadata):
-        if clear_cache:
-            cache.clear()
-        else:
-            cache.load()
-
     # Load ref
     ref_df = config.ref.load().rename(uppercase_text, axis="index").rename(columns={"category": Cols.FILE_CATEGORY})
-    # Load context
+    # Load context, memoised step results are kept across runs like the caches
     ctx = config.context
+    for memo in persisted_stores(ctx, dest_structure):
+        if memo is not None:
+            if clear_cache:
+                memo.clear()
+            else:
+                memo.load()
 
     # Validate and select source roots
     src_roots_df = pd.DataFrame(
@@ -273,6 +310,25 @@ def organise(src_roots: str | list[str], dest_root: str, dest_structure: list[st
     src_roots_df = add_depth_metrics().execute(src_roots_df)
     selected_roots_df = select_roots(src_roots_df)
 
+    # Load cache, a sharded cache only loads the shards of the selected roots and the destination
+    register, metadata = config.register, config.metadata
+
+    index = config.index
+
+    for cache in (register, metadata):
+        if isinstance(cache, ShardedCache):
+            cache.select([*selected_roots_df[Cols.SRC_ROOT], dest_root])
+
+    for cache in [c for c in (register, metadata, index) if c is not None]:
+        if clear_cache:
+            cache.clear()
+        else:
+            cache.load()
+
+    for cache in (register, metadata):
+        if isinstance(cache, ShardedCache):
+            cache.record_roots(selected_roots_df[Cols.SRC_ROOT].to_list())
+
     # Extract files to process
     dir_records = []
     file_records = []
@@ -288,25 +344,29 @@ def organise(src_roots: str | list[str], dest_root: str, dest_structure: list[st
 
     # Pre-processing
     files_df[Cols.EXIF_ARGS] = "".join(config.exif.args)
+    files_df[Cols.SEEN_AT] = datetime.now().timestamp()
     files_df = assemble_file_path(prefix="").execute(files_df)
     files_df = add_stat(prefix="", metrics=["size", "mtime", "dev", "ino", "id"]).execute(files_df)
 
     # Extract exif metadata
-    new_files_df = files_df[~files_df[Cols.FILE_ID].isin(register.data.index)].set_index(Cols.FILE_ID)
-    known_files_df = files_df[files_df[Cols.FILE_ID].isin(register.data.index)].set_index(Cols.FILE_ID)
+    route_to_shards((register, metadata), files_df[Cols.FILE_ID], files_df[Cols.INODE_DEV])
+    scan_keys = files_df[Cols.FILE_ID].dropna().unique().tolist()
+    registered_df = register.get(scan_keys, columns=REGISTER_COLS)
+    new_files_df = files_df[~files_df[Cols.FILE_ID].isin(registered_df.index)].set_index(Cols.FILE_ID)
+    known_files_df = files_df[files_df[Cols.FILE_ID].isin(registered_df.index)].set_index(Cols.FILE_ID)
 
-    changed_files_df = None
+    changed_files_df = known_files_df.iloc[:0]
 
     if not known_files_df.empty:
-        date_change = register.data.loc[known_files_df.index, Cols.MODIFIED_AT] != known_files_df[Cols.MODIFIED_AT] # risky check for float type
-        size_change = register.data.loc[known_files_df.index, Cols.SIZE] != known_files_df[Cols.SIZE]
-        args_change = register.data.loc[known_files_df.index, Cols.EXIF_ARGS] != known_files_df[Cols.EXIF_ARGS]
-        changed_files_df = known_files_df.loc[date_change | size_change | args_change]
+        date_change = registered_df.loc[known_files_df.index, Cols.MODIFIED_AT] != known_files_df[Cols.MODIFIED_AT] # risky check for float type
+        size_change = registered_df.loc[known_files_df.index, Cols.SIZE] != known_files_df[Cols.SIZE]
+        args_change = registered_df.loc[known_files_df.index, Cols.EXIF_ARGS] != known_files_df[Cols.EXIF_ARGS]
+        changed_files_df = known_files_df.loc[(date_change | size_change | args_change).fillna(True)]
 
     to_exif_df = pd.concat([new_files_df, changed_files_df])
     if not to_exif_df.empty:
         files_to_exif = to_exif_df[Cols.FILE_PATH].to_list()
-        exif_results = list(tqdm(config.exif.extract(files_to_exif), total=len(files_to_exif), desc=f"{"Extracting exif metadata":<40}", bar_format=TQDM_BAR))
+        exif_results = list(tqdm(config.exif.extract(files_to_exif, devs=to_exif_df[Cols.INODE_DEV].to_list(), inos=to_exif_df[Cols.INODE].to_list()), total=len(files_to_exif), desc=f"{"Extracting exif metadata":<40}", bar_format=TQDM_BAR))
         exif_df = pd.DataFrame(exif_results)
         exif_df["SourceFile"] = exif_df["SourceFile"].apply(os.path.normpath)
         exif_df = exif_df.merge(to_exif_df.reset_index()[[Cols.FILE_PATH, Cols.FILE_ID]], how="left", left_on="SourceFile", right_on=Cols.FILE_PATH)
@@ -322,26 +382,37 @@ def organise(src_roots: str | list[str], dest_root: str, dest_structure: list[st
         register.add(new_files_df[REGISTER_COLS])
         metadata.add(exif_df.loc[new_files_df.index])
 
-    # Select exif metadata
-    metadata_df = tag_columns(ctx, name_tags=TagsMapping.NAME, keyword_tags=TagsMapping.KEYWORD).execute(metadata.data)
-    selected_metadata_df = select_columns(
+    # refreshing SeenAt rewrites every unchanged entry, only done when the retention policy reads it
+    unchanged_ids = known_files_df.index.difference(changed_files_df.index)
+    if retention is not None and retention.uses_seen_at and not unchanged_ids.empty:
+        register.update(known_files_df.loc[unchanged_ids, [Cols.SEEN_AT]])
+
+    # Garbage collect cache
+    if retention is not None:
+        gc_stats = collect_garbage(register, metadata, retention, scanned_dirs=dirs_df[Cols.DIR_PATH].to_list(), scan_keys=scan_keys)
+        print(f"Cache GC: evicted {gc_stats.evicted} of {gc_stats.before} entries {gc_stats.to_dict()}")
+
+    # Select exif metadata, columns are resolved on the schema and only the selected ones are materialised for the scanned files
+    metadata_schema = tag_columns(ctx, name_tags=TagsMapping.NAME, keyword_tags=TagsMapping.KEYWORD).execute(pd.DataFrame(columns=metadata.columns))
+    selected_schema = select_columns(
         ctx,
         names=[Cols.FILE_TYPE_EXT, Cols.XML_HEADING_PAIRS, Cols.EXIF_GPS_LATITUDE, Cols.EXIF_GPS_LONGITUDE, Cols.EXIF_MODEL],
         tags=[Tags.CREATE_DT, Tags.ACCESS_DT, Tags.MODIFY_DT]
-    ).execute(metadata_df)
+    ).execute(metadata_schema)
+    selected_metadata_df = metadata.get(scan_keys, columns=selected_schema.columns.to_list())
 
     # Enrich files with exif metadata, assemble destination file path
     files_df = files_df.merge(selected_metadata_df, how="left", left_on=Cols.FILE_ID, right_index=True)
     files_df = consolidate_file_ext(ctx).execute(files_df)
     files_df = exclude_rows(ctx, col=Cols.CONSOLIDATED_EXT, values=["MRIMGX"]).execute(files_df)
     files_df = files_df.merge(ref_df[Cols.FILE_CATEGORY], how="left", left_on=Cols.CONSOLIDATED_EXT, right_index=True)
-    files_df = assemble_dest_dir(ctx, dest_root, dest_structure).execute(files_df)
+    files_df = assemble_dest_dir(ctx, dest_root, dest_structure, index=index).execute(files_df)
     files_df = assemble_file_path(prefix="Dest").execute(files_df)
 
     # Execute operation
-    tqdm.pandas(desc=f"{f"{operation.__name__} files into new structure":<40}", bar_format=TQDM_BAR)
-    files_df[operation.__name__] = files_df.progress_apply(lambda row: operation(row[Cols.FILE_PATH], row[dest_col(Cols.FILE_PATH)]), axis=1)
+    files_df = execute_operation(files_df, operation, config.fileops, verify=verify)
     files_df = add_stat(prefix="Dest", metrics=["dev", "ino", "id"]).execute(files_df)
+    route_to_shards((register, metadata), files_df[dest_col(Cols.FILE_ID)], files_df[dest_col(Cols.INODE_DEV)])
 
     # Remove emptied dirs
     if operation is move:
@@ -368,46 +439,104 @@ def organise(src_roots: str | list[str], dest_root: str, dest_structure: list[st
             cache.update(chg_id)
             if operation is move:
                 # drop stale cache entries
-                cache.delete(chg_id[Cols.FILE_ID])
+                cache.delete(list(src_to_dest))
 
     # save cache
     register.save(dropna=False)
     metadata.save(dropna=True)
+    for memo in persisted_stores(ctx, dest_structure):
+        if memo is not None:
+            memo.save()
+
+    # Update content index with the files now sitting in the destination tree
+    if index is not None:
+        placed = files_df.loc[files_df[operation.__name__].isna()]
+        if operation is move:
+            index.delete(placed[Cols.FILE_PATH])
+        index.add(placed.set_index(dest_col(Cols.FILE_PATH)).reindex(columns=INDEX_COLS))
+        index.save()
 
     return files_df
 
+def collect_cache_garbage(config: Config, retention: RetentionPolicy) -> GCStats:
+
+    register, metadata = config.register, config.metadata
+
+    for cache in (register, metadata):
+        cache.load()
+
+    gc_stats = collect_garbage(register, metadata, retention)
+
+    register.save(dropna=False)
+    metadata.save(dropna=True)
+
+    print(f"Cache GC: evicted {gc_stats.evicted} of {gc_stats.before} entries {gc_stats.to_dict()}")
+    return gc_stats
+
 if __name__ == "__main__":
     
-    exif_path = find_exiftool()
-
     project_root = os.path.dirname(os.path.abspath(__file__)) # __file__ does not exist in REPL, Jupyter, debugger
     cache_dir_path = os.path.join(project_root, CACHE_DIR)
     register_path = os.path.join(cache_dir_path, CACHE_REGISTER)
     metadata_path = os.path.join(cache_dir_path, CACHE_METADATA)
+    shards_path = os.path.join(cache_dir_path, CACHE_SHARDS)
+    index_path = os.path.join(cache_dir_path, CACHE_INDEX)
 
     json_loader = JSONLoader(orient="index")
     json_writer = JSONWriter(orient="index", indent=4, force_ascii=False)
 
     config = Config(
-        register=Cache(path=register_path, writer=json_writer, loader=json_loader),
-        metadata=Cache(path=metadata_path, writer=json_writer, loader=json_loader),
+        register=ShardedCache(
+            path=os.path.join(shards_path, "register"),
+            factory=lambda shard_path: JSONCache(path=f"{shard_path}.json", writer=json_writer, loader=json_loader, journal=Journal(path=f"{shard_path}.json.journal"))
+        ),
+        metadata=ShardedCache(
+            path=os.path.join(shards_path, "metadata"),
+            factory=lambda shard_path: ContentJSONCache(path=f"{shard_path}.json", writer=json_writer, loader=json_loader, journal=Journal(path=f"{shard_path}.json.journal"))
+        ),
+        # register=JSONCache(path=register_path, writer=json_writer, loader=json_loader, journal=Journal(path=f"{register_path}.journal")),
+        # metadata=ContentJSONCache(path=metadata_path, writer=json_writer, loader=json_loader, journal=Journal(path=f"{metadata_path}.journal")),
+        # register=SQLiteCache(path=os.path.join(cache_dir_path, CACHE_DB), table="register"),
+        # metadata=SQLiteCache(path=os.path.join(cache_dir_path, CACHE_DB), table="metadata"),
         ref=Reference(path="ref/extension.json", loader=json_loader),
-        exif=Exif(path=exif_path, batch_size=50, args=["-j", "-G", "-all", "--File:Directory"]),
-        context=Context(parser=DateParser(), geocoder=RGeocoder(mode=1, verbose=False))
+        exif=Exif(path=find_exiftool, batch_size=50, args=["-j", "-G", "-all", "--File:Directory"], scheduler=IOScheduler()),
+        context=Context(
+            parser_factory=partial(DateParser, path=os.path.join(cache_dir_path, CACHE_DATES)),
+            geocoder_factory=partial(GeoCache, path=os.path.join(cache_dir_path, CACHE_GEO), factory=partial(load_rgeocoder, mode=1, verbose=False)),
+            memo=MemoStore(path=os.path.join(cache_dir_path, CACHE_MEMO))
+        ),
+        index=ContentIndex(path=index_path, writer=json_writer, loader=json_loader),
+        fileops=FileOpExecutor(max_workers=8, per_src_device=2, per_dest_device=2)
     )
 
-    organised = organise(
-        # src_roots=["D:\\OneDrive"],
-        src_roots=["D:\\MyOrganizedFiles"],
-        dest_root="D:\\MyOrganizedFiles",
-        dest_structure=[dup_label_col(Cols.FILE_HASH), Cols.EARLIEST_YEAR, Cols.FILE_CATEGORY, Cols.EXIF_MODEL, Cols.IMAGE_COUNTRY, Cols.WORKSHEETS_COUNT],
-        operation=move,
-        config=config,
-        clear_cache=False,
-    )
+    # caches written before sharding are moved into the shards on the first sharded run, metadata follows the register's routes
+    routes = {}
+    if os.path.exists(register_path):
+        routes = migrate_flat_cache(JSONCache(path=register_path, writer=json_writer, loader=json_loader, journal=Journal(path=f"{register_path}.journal")), config.register, dropna=False)
+    if os.path.exists(metadata_path):
+        migrate_flat_cache(ContentJSONCache(path=metadata_path, writer=json_writer, loader=json_loader, journal=Journal(path=f"{metadata_path}.journal")), config.metadata, routes, dropna=True)
+
+    # pipeline steps are only timed while the profiler is active
+    profiler = Profiler()
+    with profiler:
+        organised = organise(
+            # src_roots=["D:\\OneDrive"],
+            src_roots=["D:\\MyOrganizedFiles"],
+            dest_root="D:\\MyOrganizedFiles",
+            dest_structure=[dup_label_col(Cols.FILE_HASH), Cols.EARLIEST_YEAR, Cols.FILE_CATEGORY, Cols.EXIF_MODEL, Cols.IMAGE_COUNTRY, Cols.WORKSHEETS_COUNT],
+            operation=move,
+            config=config,
+            clear_cache=False,
+            # retention=RetentionPolicy(verify_stat=False, max_age_days=365),
+        )
+
+    # collect_cache_garbage(config, RetentionPolicy(verify_stat=True, max_entries=2_000_000))
 
     datestamp = datetime.strftime(datetime.now(), "%Y%m%dT%H%M%S")
     CSVWriter(encoding="utf-8-sig").save(organised, f"output\\completed_{datestamp}.csv")
+    profiler.save_json(f"output\\profile_{datestamp}.json")
+    profiler.save_folded(f"output\\profile_{datestamp}.folded")
+    print(profiler.summary())
 
     # rollback_df = rollback("D:\\Development\\Software\\Projects\\file_organiser\\output\\summary_20260805T165005.csv", operation=copy, config=config)
     # datestamp = datetime.strftime(datetime.now(), "%Y%m%dT%H%M%S")
@@ -0,0 +1,182 @@
+import pandas as pd
+import pytest
+import random
+from constants import Cols
+from core.cache import ContentJSONCache, JSONCache, SparseJSONCache, SQLiteCache
+from core.journal import Journal
+from core.shard import ShardedCache
+from dataframe.load import JSONLoader
+from dataframe.write import JSONWriter
+
+def json_io() -> dict:
+    return {"loader": JSONLoader(orient="index"), "writer": JSONWriter(orient="index", indent=4, force_ascii=False)}
+
+def exif_frame(rows: dict[str, dict]) -> pd.DataFrame:
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+@pytest.fixture(params=[False, True], ids=["snapshot", "journal"])
+def content_cache(request, tmp_path):
+    path = str(tmp_path / "metadata.json")
+    journal = Journal(path=f"{path}.journal") if request.param else None
+    cache = ContentJSONCache(path=path, journal=journal, **json_io())
+    cache.load()
+    return cache
+
+def test_content_cache_shares_blob_between_identical_files(content_cache):
+    content_cache.add(exif_frame({
+        "a": {"EXIF:Model": "X100", "File:FileName": "a.jpg", Cols.FILE_PATH: "D:\\a.jpg"},
+        "b": {"EXIF:Model": "X100", "File:FileName": "b.jpg", Cols.FILE_PATH: "E:\\copy\\b.jpg"},
+    }))
+
+    assert len(content_cache.blobs) == 1
+    assert content_cache.get(["b"]).loc["b", Cols.FILE_PATH] == "E:\\copy\\b.jpg"
+
+def test_content_cache_clone_and_path_update_keep_one_blob(content_cache):
+    content_cache.add(exif_frame({"a": {"EXIF:Model": "X100", "File:FileName": "a.jpg", Cols.FILE_PATH: "D:\\a.jpg"}}))
+    content_cache.clone({"a": "c"})
+    content_cache.update(exif_frame({"c": {Cols.FILE_PATH: "D:\\2024\\a.jpg"}}))
+
+    assert len(content_cache.blobs) == 1
+    assert content_cache.blob_refs[next(iter(content_cache.blobs))] == 2
+
+    content_cache.save()
+    content_cache.load()
+    df = content_cache.get(["a", "c"], columns=["EXIF:Model", Cols.FILE_PATH])
+    assert len(content_cache.blobs) == 1
+    assert df.loc["a", Cols.FILE_PATH] == "D:\\a.jpg"
+    assert df.loc["c", Cols.FILE_PATH] == "D:\\2024\\a.jpg"
+    assert df["EXIF:Model"].tolist() == ["X100", "X100"]
+
+def test_content_cache_splits_path_out_of_older_snapshots(tmp_path):
+    path = str(tmp_path / "metadata.json")
+    blobs = {"1": {"EXIF:Model": "X100", Cols.FILE_PATH: "D:\\a.jpg"}, "2": {"EXIF:Model": "X100", Cols.FILE_PATH: "D:\\b.jpg"}}
+    json_io()["writer"].save_records({"__blobs__": blobs, "__refs__": {"a": "1", "b": "2"}, "__local__": {}}, path)
+    cache = ContentJSONCache(path=path, **json_io())
+    cache.load()
+
+    assert len(cache.blobs) == 1
+    assert cache.get(["a", "b"], columns=[Cols.FILE_PATH])[Cols.FILE_PATH].tolist() == ["D:\\a.jpg", "D:\\b.jpg"]
+
+def cache_state(cache) -> dict[str, dict]:
+    # the cache as plain rows, missing values dropped
+    df = cache.get()
+    return {key: {col: value for col, value in row.items() if not pd.isna(value)} for key, row in df.to_dict(orient="index").items()}
+
+def random_rows(rng: random.Random, keys: list[str], cols: list[str], nulls: bool) -> dict[str, dict]:
+    return {key: {col: None if nulls and rng.random() < 0.2 else f"v{rng.randrange(1000)}" for col in cols} for key in keys}
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("journal", [False, True], ids=["snapshot", "journal"])
+@pytest.mark.parametrize("cache_type", [JSONCache, SparseJSONCache, ContentJSONCache])
+def test_file_cache_matches_a_dict_model(tmp_path, seed, journal, cache_type):
+    # random sequences of mutations, saves and reloads against a dict of rows
+    rng = random.Random(seed)
+    path = str(tmp_path / "register.json")
+    make = lambda: cache_type(path=path, journal=Journal(path=f"{path}.journal") if journal else None, **json_io())
+    cache, model = make(), {}
+    cache.load()
+    cols = ["A", "B", "C"]
+    next_key = 0
+
+    for _ in range(30):
+        op = rng.choice(["add", "update", "clone", "delete", "save", "reload"])
+        keys = list(model)
+        if op == "add":
+            new_keys = [f"k{next_key + i}" for i in range(rng.randint(1, 3))]
+            next_key += len(new_keys)
+            rows = random_rows(rng, new_keys, rng.sample(cols, rng.randint(1, 3)), nulls=True)
+            cache.add(pd.DataFrame.from_dict(rows, orient="index"))
+            model.update({key: {col: value for col, value in row.items() if value is not None} for key, row in rows.items()})
+        elif op == "update" and keys:
+            rows = random_rows(rng, rng.sample(keys, rng.randint(1, len(keys))), rng.sample(cols, rng.randint(1, 3)), nulls=True)
+            cache.update(pd.DataFrame.from_dict(rows, orient="index"))
+            for key, row in rows.items():
+                for col, value in row.items():
+                    if value is None:
+                        model[key].pop(col, None)
+                    else:
+                        model[key][col] = value
+        elif op == "clone" and keys:
+            mapping = {src: f"k{next_key + i}" for i, src in enumerate(rng.sample(keys, rng.randint(1, len(keys))))}
+            next_key += len(mapping)
+            cache.clone(mapping)
+            model.update({dest: dict(model[src]) for src, dest in mapping.items()})
+        elif op == "delete" and keys:
+            deleted = rng.sample(keys, rng.randint(1, len(keys))) + ["missing"]
+            cache.delete(deleted)
+            for key in deleted:
+                model.pop(key, None)
+        elif op == "save":
+            cache.save()
+        elif op == "reload":
+            cache.save()
+            cache._wait_compaction()
+            cache = make()
+            cache.load()
+        assert cache_state(cache) == model, op
+
+def test_sqlite_cache_persists_only_what_was_changed(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SQLiteCache(path=path, table="register")
+    cache.load()
+    cache.add(exif_frame({"a": {"Size": 10, "Name": "a.jpg"}, "b": {"Size": 20, "Name": "b.jpg"}}))
+    cache.save()
+
+    cache.update(exif_frame({"a": {"Size": 11, "Name": None}}))
+    cache.clone({"b": "c"})
+    cache.delete(["b"])
+    cache.save()
+
+    reloaded = SQLiteCache(path=path, table="register")
+    reloaded.load()
+    assert cache_state(reloaded) == {"a": {"Size": 11}, "c": {"Size": 20, "Name": "b.jpg"}}
+    assert set(reloaded.columns) == {"Size", "Name"}
+
+def test_sqlite_cache_update_with_an_unknown_key_changes_nothing(tmp_path):
+    cache = SQLiteCache(path=str(tmp_path / "cache.sqlite"))
+    cache.load()
+    cache.add(exif_frame({"a": {"Size": 10}}))
+    cache.save()
+
+    with pytest.raises(KeyError):
+        cache.update(exif_frame({"a": {"Size": 11}, "missing": {"Size": 1}}))
+    with pytest.raises(KeyError):
+        cache.clone({"missing": "b"})
+    assert cache.changed == {}
+    assert cache_state(cache) == {"a": {"Size": 10}}
+
+def test_sparse_cache_keeps_no_nulls_and_materialises_selected_columns(tmp_path):
+    path = str(tmp_path / "metadata.json")
+    cache = SparseJSONCache(path=path, **json_io())
+    cache.load()
+    cache.add(exif_frame({"a": {"EXIF:Model": "X100", "EXIF:ISO": 200}, "b": {"EXIF:Model": "A7", "XMP:Rating": 5}}))
+    cache.update(exif_frame({"b": {"XMP:Rating": None}}))
+    assert cache.data == {"a": {"EXIF:Model": "X100", "EXIF:ISO": 200}, "b": {"EXIF:Model": "A7"}}
+    assert cache.columns == ["EXIF:Model", "EXIF:ISO"]
+
+    cache.save()
+    assert json_io()["loader"].load_records(path) == cache.data
+    df = cache.get(["b", "missing"], columns=["EXIF:Model", "XMP:Rating"])
+    assert df.index.tolist() == ["b"] and df.columns.tolist() == ["EXIF:Model", "XMP:Rating"]
+    assert df.loc["b", "EXIF:Model"] == "A7" and pd.isna(df.loc["b", "XMP:Rating"])
+
+@pytest.mark.parametrize("backend", ["json", "sparse", "content", "sqlite", "sharded"])
+def test_scoped_get_returns_only_scanned_keys_and_selected_columns(tmp_path, backend):
+    # organise reads the register and metadata for the keys of the current scan only
+    path = str(tmp_path / "cache.json")
+    if backend == "sqlite":
+        cache = SQLiteCache(path=str(tmp_path / "cache.sqlite"))
+    elif backend == "sharded":
+        cache = ShardedCache(path=str(tmp_path / "shards"), factory=lambda shard_path: JSONCache(path=f"{shard_path}.json", **json_io()))
+    else:
+        cache = {"json": JSONCache, "sparse": SparseJSONCache, "content": ContentJSONCache}[backend](path=path, **json_io())
+    cache.load()
+    if backend == "sharded":
+        cache.assign({"a": "dev-1", "b": "dev-2", "c": "dev-1"})
+    cache.add(exif_frame({key: {"EXIF:Model": f"model-{key}", "EXIF:ISO": 100, "XMP:Rating": 1} for key in ["a", "b", "c"]}))
+
+    df = cache.get(["c", "a", "a", "not-scanned"], columns=["XMP:Rating", "EXIF:Model", "EXIF:Missing"])
+    assert sorted(df.index) == ["a", "c"]
+    assert df.columns.tolist() == ["XMP:Rating", "EXIF:Model", "EXIF:Missing"]
+    assert df.loc["c", "EXIF:Model"] == "model-c" and df["EXIF:Missing"].isna().all()
+    assert cache.get(["not-scanned"], columns=["EXIF:Model"]).empty
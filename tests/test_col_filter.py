@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+import warnings
+from dataframe.col_filter import KeywordFilter, NameFilter, TagFilter, column_index, match_keywords
+from dataframe.context import Context
+
+COLUMNS = ["EXIF:DateTimeOriginal", "File:FileModifyDate", "EXIF:Model", "XMP:CreateDate", "Composite:GPSLatitude"]
+
+def frame() -> pd.DataFrame:
+    return pd.DataFrame(columns=COLUMNS)
+
+@pytest.mark.parametrize("keywords", [["date"], ["model", "DATE"], ["gps", "exif:"], ["missing"], [""]])
+def test_keyword_filter_matches_the_linear_scan(keywords):
+    expected = list(dict.fromkeys(col for _, col in match_keywords(COLUMNS, keywords)))
+    assert KeywordFilter(keywords).select(frame(), Context()) == expected
+
+def test_name_filter_keeps_requested_order_and_warns_once_per_schema():
+    df = frame()
+    with pytest.warns(UserWarning, match="EXIF:Missing"):
+        assert NameFilter(["EXIF:Model", "EXIF:Missing", "EXIF:DateTimeOriginal"]).select(df, Context()) == ["EXIF:Model", "EXIF:DateTimeOriginal"]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        NameFilter(["EXIF:Model", "EXIF:Missing", "EXIF:DateTimeOriginal"]).select(df, Context())
+
+def test_column_index_follows_schema_changes():
+    df = frame()
+    assert column_index(df) is column_index(df)
+    df["EXIF:LensModel"] = None
+    assert KeywordFilter("model").select(df, Context()) == ["EXIF:Model", "EXIF:LensModel"]
+
+def test_tag_filter_selects_tagged_columns_present_in_the_frame():
+    ctx = Context()
+    ctx.store.assign_tags("EXIF:DateTimeOriginal", "create_dt").assign_tags("Gone", "create_dt")
+    assert TagFilter(["create_dt"]).select(frame(), ctx) == ["EXIF:DateTimeOriginal"]
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import time
+from core.config import Exif
+from core.scheduler import IOScheduler
+
+def test_exif_locates_the_executable_once_for_all_device_threads(monkeypatch):
+    calls = []
+    def locate() -> str:
+        calls.append(1)
+        time.sleep(0.01)
+        return f"exiftool-{len(calls)}"
+
+    def extract_batches(self, files, executable):
+        for path in files:
+            yield {"SourceFile": path, "executable": executable}
+
+    monkeypatch.setattr(Exif, "_extract_batches", extract_batches)
+    exif = Exif(path=locate, batch_size=2, scheduler=IOScheduler())
+    files = [f"/dev{dev}/{pos}.jpg" for dev in range(3) for pos in range(4)]
+    records = list(exif.extract(files, devs=[dev for dev in range(3) for _ in range(4)], inos=list(range(12))))
+
+    assert sorted(record["SourceFile"] for record in records) == sorted(files)
+    assert len(calls) == 1
+    assert {record["executable"] for record in records} == {"exiftool-1"}
+    assert exif.path == "exiftool-1"
+
+def test_config_and_pipelines_import_without_heavy_modules():
+    # main's own import is checked by benchmarks/startup.py, it needs a newer Python than these modules
+    probe = "import sys, core.config, core.pipelines, core.geocache; print([name for name in ('exiftool', 'reverse_geocoder', 'scipy', 'tqdm') if name in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
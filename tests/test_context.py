@@ -0,0 +1,15 @@
+from dataframe.context import Context
+
+def test_context_builds_parser_and_geocoder_on_first_use_only():
+    built = []
+    ctx = Context(parser_factory=lambda: built.append("parser") or "parser", geocoder_factory=lambda: built.append("geocoder") or "geocoder")
+    assert built == []
+
+    assert ctx.parser == "parser" and ctx.parser == "parser"
+    assert built == ["parser"]
+    assert ctx.geocoder == "geocoder"
+    assert built == ["parser", "geocoder"]
+
+def test_context_without_factories_has_no_parser_or_geocoder():
+    ctx = Context()
+    assert ctx.parser is None and ctx.geocoder is None
@@ -0,0 +1,125 @@
+from collections import Counter
+import errno
+import hashlib
+import os
+import pytest
+import threading
+import time
+from core import fileops
+from core.fileops import FileOpExecutor, copy, move
+
+def rename_error(code: int):
+    def rename(src, dest):
+        raise OSError(code, os.strerror(code))
+    return rename
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / "src" / "a.jpg"
+    path.parent.mkdir()
+    path.write_bytes(b"photo")
+    return str(path)
+
+def test_move_renames_on_the_same_device(src, tmp_path):
+    dest = str(tmp_path / "dest" / "a.jpg")
+    assert move(src, dest) == (None, None)
+    assert not os.path.exists(src)
+    assert open(dest, "rb").read() == b"photo"
+
+def test_move_copies_across_devices_and_hashes_the_data(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(fileops.os, "rename", rename_error(errno.EXDEV))
+    dest = str(tmp_path / "dest" / "a.jpg")
+    assert move(src, dest) == (None, hashlib.md5(b"photo").hexdigest())
+    assert not os.path.exists(src)
+    assert open(dest, "rb").read() == b"photo"
+
+def test_move_does_not_copy_on_other_rename_errors(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(fileops.os, "rename", rename_error(errno.EACCES))
+    dest = str(tmp_path / "dest" / "a.jpg")
+    error, _ = move(src, dest)
+    assert isinstance(error, PermissionError)
+    assert os.path.exists(src)
+    assert not os.path.exists(dest)
+
+def test_move_removes_the_copy_when_the_source_cannot_be_removed(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(fileops.os, "rename", rename_error(errno.EXDEV))
+    remove = os.remove
+    def remove_all_but_src(path):
+        if path == src:
+            raise PermissionError(errno.EACCES, "in use", path)
+        remove(path)
+    monkeypatch.setattr(fileops.os, "remove", remove_all_but_src)
+    dest = str(tmp_path / "dest" / "a.jpg")
+    error, _ = move(src, dest)
+    assert isinstance(error, PermissionError)
+    assert os.path.exists(src)
+    assert not os.path.exists(dest)
+
+def test_copy_refuses_an_occupied_destination(src, tmp_path):
+    dest = tmp_path / "dest.jpg"
+    dest.write_bytes(b"other")
+    error, _ = copy(src, str(dest))
+    assert isinstance(error, RuntimeError)
+    assert dest.read_bytes() == b"other"
+
+class RecordingOperation:
+    # fake copy that records how many operations run at once, per source and destination device
+    def __init__(self, src_devs: dict[str, int], dest_devs: dict[str, int]):
+        self.src_devs, self.dest_devs = src_devs, dest_devs
+        self.lock = threading.Lock()
+        self.reading, self.writing = Counter(), Counter()
+        self.max_reading, self.max_writing = Counter(), Counter()
+        self.running = self.max_running = 0
+
+    def __call__(self, src, dest, file_hash=None):
+        src_dev, dest_dev = self.src_devs[src], self.dest_devs[dest]
+        with self.lock:
+            self.reading[src_dev] += 1
+            self.writing[dest_dev] += 1
+            self.running += 1
+            self.max_reading[src_dev] = max(self.max_reading[src_dev], self.reading[src_dev])
+            self.max_writing[dest_dev] = max(self.max_writing[dest_dev], self.writing[dest_dev])
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.005)
+        with self.lock:
+            self.reading[src_dev] -= 1
+            self.writing[dest_dev] -= 1
+            self.running -= 1
+        if src.endswith("bad"):
+            raise OSError("read failed")
+        return None, f"hash-{src}"
+
+@pytest.fixture
+def device_executor(monkeypatch):
+    # destinations d<dev>/... are on device <dev>, whether or not the directory exists
+    executor = FileOpExecutor(max_workers=6, per_src_device=2, per_dest_device=1)
+    monkeypatch.setattr(executor, "_dest_device", lambda path, devs_by_dir: int(path.split("/")[0][1:]))
+    return executor
+
+def test_executor_keeps_per_device_limits_and_input_order(device_executor):
+    srcs = [f"s{pos}" for pos in range(24)]
+    dests = [f"d{pos % 4}/{pos}" for pos in range(24)]
+    src_devs = [pos % 3 for pos in range(24)]
+    operation = RecordingOperation(dict(zip(srcs, src_devs)), {dest: pos % 4 for pos, dest in enumerate(dests)})
+
+    results = device_executor.run(operation, srcs, dests, src_devs=src_devs, sizes=range(24))
+
+    assert results == [(None, f"hash-{src}") for src in srcs]
+    assert max(operation.max_reading.values()) <= 2
+    assert max(operation.max_writing.values()) == 1
+    assert operation.max_running <= 4
+
+def test_executor_returns_operation_errors_in_their_row(device_executor):
+    srcs = ["s0", "s1bad", "s2"]
+    operation = RecordingOperation(dict.fromkeys(srcs, 0), dict.fromkeys(["d0/0", "d0/1", "d0/2"], 0))
+
+    results = device_executor.run(operation, srcs, ["d0/0", "d0/1", "d0/2"], file_hashes=["h0", "h1", "h2"], src_devs=[0, 0, 0])
+
+    assert results[0] == (None, "hash-s0") and results[2] == (None, "hash-s2")
+    error, file_hash = results[1]
+    assert isinstance(error, OSError) and file_hash == "h1"
+
+@pytest.mark.parametrize("limit", ["max_workers", "per_src_device", "per_dest_device"])
+def test_executor_rejects_limits_below_one(limit):
+    with pytest.raises(ValueError):
+        FileOpExecutor(**{limit: 0})
@@ -0,0 +1,64 @@
+import os
+import pandas as pd
+from constants import Cols
+from core.cache import JSONCache, SparseJSONCache
+from core.gc import RetentionPolicy, collect_garbage
+from core.pipelines import get_id
+from tests.test_cache import cache_state, json_io
+
+NOW = 1_800_000_000.0
+DAY = 86400
+
+def register_entry(path, seen_days_ago: float = 0, size: int | None = None) -> tuple[str, dict]:
+    # keyed like organise keys files, by device and inode
+    stat = os.stat(path)
+    return get_id(stat), {Cols.FILE_PATH: str(path), Cols.SIZE: stat.st_size if size is None else size, Cols.MODIFIED_AT: stat.st_mtime, Cols.SEEN_AT: NOW - seen_days_ago * DAY}
+
+def caches(tmp_path, entries: dict[str, dict]) -> tuple[JSONCache, SparseJSONCache]:
+    register = JSONCache(path=str(tmp_path / "register.json"), **json_io())
+    metadata = SparseJSONCache(path=str(tmp_path / "metadata.json"), **json_io())
+    register.load()
+    metadata.load()
+    register.add(pd.DataFrame.from_dict(entries, orient="index"))
+    metadata.add(pd.DataFrame.from_dict({key: {"EXIF:Model": "X100"} for key in entries}, orient="index"))
+    return register, metadata
+
+def photo(tmp_path, name: str, folder: str = "photos") -> str:
+    path = tmp_path / folder / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(name.encode())
+    return str(path)
+
+def test_gc_evicts_missing_changed_expired_and_out_of_root_entries(tmp_path):
+    valid = register_entry(photo(tmp_path, "valid.jpg"))
+    missing = register_entry(photo(tmp_path, "missing.jpg"))
+    changed = register_entry(photo(tmp_path, "changed.jpg"), size=1)
+    expired = register_entry(photo(tmp_path, "expired.jpg"), seen_days_ago=400)
+    elsewhere = register_entry(photo(tmp_path, "other.jpg", folder="elsewhere"))
+    register, metadata = caches(tmp_path, dict([valid, missing, changed, expired, elsewhere]))
+    os.remove(missing[1][Cols.FILE_PATH])
+
+    policy = RetentionPolicy(verify_stat=True, max_age_days=365, roots=[str(tmp_path / "photos")])
+    stats = collect_garbage(register, metadata, policy, now=NOW)
+
+    assert (stats.before, stats.missing, stats.changed, stats.expired, stats.out_of_roots, stats.after) == (5, 1, 1, 1, 1, 1)
+    assert list(cache_state(register)) == [valid[0]]
+    assert list(cache_state(metadata)) == [valid[0]]
+
+def test_gc_evicts_unseen_entries_and_keeps_the_most_recently_seen(tmp_path):
+    entries = dict(register_entry(photo(tmp_path, f"{pos}.jpg"), seen_days_ago=pos) for pos in range(4))
+    keys = list(entries)
+    register, metadata = caches(tmp_path, entries)
+
+    # the scan listed the photos directory but no longer found the first file
+    stats = collect_garbage(register, metadata, RetentionPolicy(verify_stat=False, max_entries=2), scanned_dirs=[str(tmp_path / "photos")], scan_keys=keys[1:], now=NOW)
+
+    assert (stats.unseen, stats.over_capacity, stats.after) == (1, 1, 2)
+    assert sorted(cache_state(register)) == sorted(keys[1:3])
+    assert sorted(cache_state(metadata)) == sorted(keys[1:3])
+
+def test_only_expiry_and_capacity_use_seen_at():
+    assert not RetentionPolicy().uses_seen_at
+    assert not RetentionPolicy(roots=["/data"]).uses_seen_at
+    assert RetentionPolicy(max_age_days=30).uses_seen_at
+    assert RetentionPolicy(max_entries=100).uses_seen_at
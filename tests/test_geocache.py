@@ -0,0 +1,37 @@
+from core.geocache import BORDER, GeoCache
+from tests.test_pipelines import HemisphereGeocoder
+
+def geo_cache(tmp_path, geocoder: HemisphereGeocoder, precision: int = 2) -> GeoCache:
+    cache = GeoCache(path=str(tmp_path / "geo.json"), factory=lambda: geocoder, precision=precision)
+    cache.load()
+    return cache
+
+def test_geocache_answers_points_in_known_cells_without_the_geocoder(tmp_path):
+    geocoder = HemisphereGeocoder()
+    cache = geo_cache(tmp_path, geocoder)
+    assert cache.query([(51.501, -0.101), (-33.861, 151.211)]) == [{"cc": "N"}, {"cc": "S"}]
+    queried = len(geocoder.queries)
+
+    # other points in the same cells
+    assert cache.query([(51.509, -0.109), (-33.869, 151.219)]) == [{"cc": "N"}, {"cc": "S"}]
+    assert len(geocoder.queries) == queried
+    assert (cache.hits, cache.misses) == (2, 2)
+
+def test_geocache_resolves_border_cells_per_point_and_keeps_them(tmp_path):
+    geocoder = HemisphereGeocoder()
+    cache = geo_cache(tmp_path, geocoder)
+    # the cell from -0.01 to 0.00 touches the equator, its corners disagree
+    assert cache.query([(-0.005, 10.0), (-0.005, 10.0)]) == [{"cc": "S"}, {"cc": "S"}]
+    assert cache.cells["-1,1000"] is BORDER
+    assert geocoder.queries[-1] == [(-0.005, 10.0)]
+    cache.save()
+
+    reloaded = geo_cache(tmp_path, HemisphereGeocoder())
+    assert reloaded.query([(-0.005, 10.0)]) == [{"cc": "S"}]
+    assert reloaded.geocoder is None
+
+def test_geocache_ignores_a_file_written_with_another_precision(tmp_path):
+    cache = geo_cache(tmp_path, HemisphereGeocoder())
+    cache.query([(51.5, -0.1)])
+    cache.save()
+    assert geo_cache(tmp_path, HemisphereGeocoder(), precision=3).cells == {}
@@ -0,0 +1,46 @@
+import os
+import pandas as pd
+from constants import Cols
+from core.index import ContentIndex
+from tests.test_cache import json_io
+
+def archived(tmp_path, name: str, data: bytes) -> tuple[str, dict]:
+    path = tmp_path / "dest" / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(data)
+    stat = os.stat(path)
+    return str(path), {Cols.SIZE: stat.st_size, Cols.MODIFIED_AT: stat.st_mtime}
+
+def scanned(tmp_path, data: bytes) -> pd.Series:
+    path = tmp_path / "new.jpg"
+    path.write_bytes(data)
+    return pd.Series({Cols.FILE_PATH: str(path), Cols.SIZE: len(data)})
+
+def test_content_index_finds_a_duplicate_already_in_the_destination(tmp_path):
+    index = ContentIndex(path=str(tmp_path / "index.json"), **json_io())
+    index.load()
+    a, a_stat = archived(tmp_path, "a.jpg", b"photo-a")
+    b, b_stat = archived(tmp_path, "b.jpg", b"photo-b")
+    index.add(pd.DataFrame.from_dict({a: a_stat, b: b_stat}, orient="index"))
+
+    assert index.match(scanned(tmp_path, b"photo-b")) == b
+    assert index.match(scanned(tmp_path, b"photo-c")) is None
+    assert index.match(scanned(tmp_path, b"other size")) is None
+
+    # hashes of archived files are computed on the first collision and kept across runs
+    index.save()
+    reloaded = ContentIndex(path=str(tmp_path / "index.json"), **json_io())
+    reloaded.load()
+    assert pd.notna(reloaded.data.at[b, Cols.FILE_HASH])
+    assert reloaded.match(scanned(tmp_path, b"photo-b")) == b
+
+def test_content_index_drops_archived_files_changed_since_indexed(tmp_path):
+    index = ContentIndex(path=str(tmp_path / "index.json"), **json_io())
+    index.load()
+    a, a_stat = archived(tmp_path, "a.jpg", b"photo-a")
+    index.add(pd.DataFrame.from_dict({a: a_stat}, orient="index"))
+    os.utime(a, (a_stat[Cols.MODIFIED_AT] + 10, a_stat[Cols.MODIFIED_AT] + 10))
+
+    assert index.match(scanned(tmp_path, b"photo-a")) is None
+    assert a not in index.data.index
+    assert index.by_size.get(a_stat[Cols.SIZE], set()) == set()
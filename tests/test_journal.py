@@ -0,0 +1,75 @@
+import os
+import pandas as pd
+from constants import Cols
+from core.cache import JSONCache
+from core.journal import Journal
+from tests.test_cache import cache_state, json_io
+
+def register_frame(rows: dict[str, int]) -> pd.DataFrame:
+    return pd.DataFrame({Cols.SIZE: rows})
+
+def journaled(path: str, threshold: int = 32 * 1024 * 1024) -> JSONCache:
+    cache = JSONCache(path=path, journal=Journal(path=f"{path}.journal", threshold=threshold), **json_io())
+    cache.load()
+    return cache
+
+def test_checkpointed_mutations_are_replayed_without_a_snapshot(tmp_path):
+    path = str(tmp_path / "register.json")
+    cache = journaled(path)
+    cache.add(register_frame({"a": 1, "b": 2}))
+    cache.update(register_frame({"a": 3}))
+    cache.clone({"b": "c"})
+    cache.delete(["b"])
+    cache.save()
+    cache.journal.close()  # the process ends here, the snapshot is still the empty one
+
+    assert json_io()["loader"].load_records(path) == {}
+    assert cache_state(journaled(path)) == {"a": {Cols.SIZE: 3}, "c": {Cols.SIZE: 2}}
+
+def test_replay_stops_at_a_torn_write(tmp_path):
+    path = str(tmp_path / "register.json")
+    cache = journaled(path)
+    cache.add(register_frame({"a": 1}))
+    cache.save()
+    cache.journal.close()
+    with open(f"{path}.journal", mode="a", encoding="utf-8") as f:
+        f.write('{"op": "add", "data": {"b": {"Si')
+
+    reloaded = journaled(path)
+    assert cache_state(reloaded) == {"a": {Cols.SIZE: 1}}
+
+    # records written after the tear are replayed on the next load
+    reloaded.add(register_frame({"z": 2}))
+    reloaded.save()
+    reloaded.journal.close()
+    assert cache_state(journaled(path)) == {"a": {Cols.SIZE: 1}, "z": {Cols.SIZE: 2}}
+
+def test_interrupted_compaction_is_finished_on_load(tmp_path):
+    path = str(tmp_path / "register.json")
+    cache = journaled(path)
+    cache.add(register_frame({"a": 1}))
+    cache.save()
+    cache.journal.rotate()  # compaction started, its snapshot never written
+    cache.update(register_frame({"a": 2}))
+    cache.save()
+    cache.journal.close()
+
+    reloaded = journaled(path)
+    assert cache_state(reloaded) == {"a": {Cols.SIZE: 2}}
+    assert not os.path.exists(reloaded.journal.rotated_path)
+    assert json_io()["loader"].load_records(path) == {"a": {Cols.SIZE: 2}}
+    assert reloaded.journal.size() == 0
+
+def test_save_compacts_in_the_background_past_the_threshold(tmp_path):
+    path = str(tmp_path / "register.json")
+    cache = journaled(path, threshold=0)
+    cache.add(register_frame({"a": 1}))
+    cache.save()
+    cache._wait_compaction()
+
+    assert json_io()["loader"].load_records(path) == {"a": {Cols.SIZE: 1}}
+    assert cache.journal.size() == 0 and not os.path.exists(cache.journal.rotated_path)
+    cache.update(register_frame({"a": 2}))
+    cache.save()
+    cache._wait_compaction()
+    assert cache_state(journaled(path)) == {"a": {Cols.SIZE: 2}}
@@ -0,0 +1,44 @@
+import pandas as pd
+from dataframe.col_filter import NameFilter
+from dataframe.context import Context
+from dataframe.memo import MemoStore
+from dataframe.pipeline import Compute, Pipeline
+from dataframe.processor import ElementProcessor
+
+SEEN = []
+
+def shout(value):
+    SEEN.append(value)
+    return f"{value}!"
+
+def run(memo: MemoStore, values: list) -> pd.DataFrame:
+    pipeline = Pipeline([Compute(ElementProcessor(shout), NameFilter(["name"]), dest_col="out", memo=True)], context=Context(memo=memo))
+    return pipeline.execute(pd.DataFrame({"name": values}))
+
+def test_memo_only_computes_rows_not_seen_by_an_earlier_run(tmp_path):
+    SEEN.clear()
+    path = str(tmp_path / "memo.json")
+    first = MemoStore(path=path)
+    first.load()
+    assert run(first, ["a", "b", "a"])["out"].tolist() == ["a!", "b!", "a!"]
+    first.save()
+    assert sorted(SEEN) == ["a", "a", "b"]
+
+    SEEN.clear()
+    second = MemoStore(path=path)
+    second.load()
+    assert run(second, ["b", "c", "a"])["out"].tolist() == ["b!", "c!", "a!"]
+    assert SEEN == ["c"]
+    assert (second.hits, second.misses) == (2, 1)
+
+def test_memo_evicts_least_recently_used_rows_past_max_entries():
+    SEEN.clear()
+    memo = MemoStore(max_entries=2)
+    run(memo, ["a", "b"])
+    run(memo, ["a"])
+    run(memo, ["c"])
+    assert memo.size == 2
+
+    SEEN.clear()
+    run(memo, ["a", "b"])
+    assert SEEN == ["b"]
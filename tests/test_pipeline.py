@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from dataframe.col_filter import NameFilter
+from dataframe.pipeline import Compute, Pipeline, assign_result
+from dataframe.predicate import Condition
+from dataframe.processor import ElementProcessor
+
+def frame() -> pd.DataFrame:
+    return pd.DataFrame({"size": [10, 20, 30]}, index=["a", "b", "c"])
+
+def masked(df: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    mask = pd.Series([True, False, True], index=df.index)
+    return mask, pd.Series([1, 3], index=["a", "c"])
+
+def test_untyped_result_is_object_with_none_outside_the_mask():
+    df = frame()
+    mask, values = masked(df)
+    assign_result(df, "out", values, mask)
+    assert df["out"].dtype == object
+    assert df["out"].tolist() == [1, None, 3]
+
+def test_untyped_result_keeps_existing_values_outside_the_mask():
+    df = frame().assign(out=["x", "y", "z"])
+    mask, values = masked(df)
+    assign_result(df, "out", values, mask)
+    assert df["out"].tolist() == [1, "y", 3]
+
+@pytest.mark.parametrize("dtype", ["Int64", "UInt64", "Float64"])
+def test_declared_numeric_result_is_nullable(dtype):
+    df = frame()
+    mask, values = masked(df)
+    assign_result(df, "out", values, mask, dtype)
+    assert str(df["out"].dtype) == dtype
+    assert df["out"].isna().tolist() == [False, True, False]
+
+    assign_result(df, "out", pd.Series([2], index=["b"]), ~mask, dtype)
+    assert str(df["out"].dtype) == dtype
+    assert df["out"].tolist() == [1, 2, 3]
+
+def test_declared_category_result_adds_new_categories():
+    df = frame().assign(out=pd.Series(["jpg", "png", "jpg"], index=["a", "b", "c"], dtype="category"))
+    mask, _ = masked(df)
+    assign_result(df, "out", pd.Series(["heic", "heic"], index=["a", "c"]), mask, "category")
+    assert df["out"].dtype == "category"
+    assert df["out"].tolist() == ["heic", "png", "heic"]
+
+def test_compute_writes_declared_dtype():
+    df = Pipeline([
+        Compute(ElementProcessor(lambda size: size > 15), NameFilter(["size"]), dest_col="large", where=Condition("size", "lt", 25), dtype="boolean"),
+    ]).execute(frame())
+    assert df["large"].dtype == "boolean"
+    assert df["large"].tolist() == [False, True, pd.NA]
@@ -0,0 +1,66 @@
+import os
+import pandas as pd
+from constants import Cols
+from core.pipelines import build_dir_paths, build_file_paths, dup_col, get_countries, join_paths, resolve_exts, split_filenames
+from dataframe.processor import VectorProcessor
+from utils.path import parse_filename
+
+FILENAMES = ["a.jpg", "archive.tar.gz", "noext", ".hidden", "trailing.", "..dots..jpg..", "UPPER.JPG"]
+
+def test_split_filenames_matches_parse_filename():
+    stem, ext = split_filenames(pd.Series(FILENAMES))
+    assert list(zip(stem, ext)) == [parse_filename(filename) for filename in FILENAMES]
+
+def test_join_paths_matches_os_path_join():
+    dirs = ["photos", f"photos{os.sep}", "", f"a{os.sep}b"]
+    assert join_paths(pd.Series(dirs), pd.Series(["x.jpg"] * len(dirs))).tolist() == [os.path.join(d, "x.jpg") for d in dirs]
+
+def test_build_file_paths_makes_duplicate_names_unique_with_the_inode():
+    df = pd.DataFrame({
+        Cols.FILE_DIR_PATH: ["photos", "photos"],
+        Cols.FILE_NAME: ["a.jpg", "A.jpg"],
+        dup_col(Cols.FILE_NAME): [False, True],
+        Cols.INODE: [11, 12],
+    })
+    assert build_file_paths(df).tolist() == [os.path.join("photos", "a.jpg"), os.path.join("photos", "A_12.jpg")]
+
+def test_build_dir_paths_skips_missing_components():
+    df = pd.DataFrame({"year": pd.array([2024, None], dtype="Int64"), "category": ["Image", "Document"], "model": [None, "X100"]})
+    assert build_dir_paths(df, root="dest").tolist() == [os.path.join("dest", "2024", "Image"), os.path.join("dest", "Document", "X100")]
+
+def test_resolve_exts_prefers_the_exif_extension():
+    df = pd.DataFrame({Cols.FILE_TYPE_EXT: ["JPEG", None, None], Cols.FILE_NAME: ["a.jpg", "b.png", "noext"]})
+    assert resolve_exts(df).tolist() == ["JPEG", "PNG", ""]
+
+def test_vector_processor_returns_one_value_per_row_and_skips_empty_frames():
+    calls = []
+    processor = VectorProcessor(lambda df, suffix: calls.append(1) or [f"{value}{suffix}" for value in df["a"]], suffix="!")
+    df = pd.DataFrame({"a": ["x", "y"]}, index=[5, 7])
+    assert processor.process(df).to_dict() == {5: "x!", 7: "y!"}
+    assert processor.process(df.iloc[:0]).empty
+    assert calls == [1]
+
+class HemisphereGeocoder:
+    # RGeocoder.query stand-in: north or south of the equator, records every query
+    def __init__(self):
+        self.queries = []
+
+    def query(self, coordinates):
+        self.queries.append(list(coordinates))
+        return [{"cc": "N" if lat >= 0 else "S"} for lat, _ in coordinates]
+
+def test_get_countries_queries_each_distinct_location_once():
+    geocoder = HemisphereGeocoder()
+    df = pd.DataFrame({
+        Cols.EXIF_GPS_LATITUDE: [51.5, -33.9, 51.5, None, 10.0],
+        Cols.EXIF_GPS_LONGITUDE: [-0.1, 151.2, -0.1, 5.0, None],
+    }, index=["a", "b", "c", "d", "e"])
+
+    assert get_countries(df, geocoder).to_dict() == {"a": "N", "b": "S", "c": "N", "d": None, "e": None}
+    assert geocoder.queries == [[(51.5, -0.1), (-33.9, 151.2)]]
+
+def test_get_countries_without_coordinates_does_not_query():
+    geocoder = HemisphereGeocoder()
+    df = pd.DataFrame({Cols.EXIF_GPS_LATITUDE: [None], Cols.EXIF_GPS_LONGITUDE: [None]}, dtype=float)
+    assert get_countries(df, geocoder).tolist() == [None]
+    assert geocoder.queries == []
@@ -0,0 +1,66 @@
+from dataclasses import dataclass, field
+import pandas as pd
+from dataframe.col_filter import NameFilter
+from dataframe.pipeline import Pipeline, Compute
+from dataframe.planner import FusedCompute, InvalidateMasks, optimize
+from dataframe.predicate import Condition
+from dataframe.processor import ElementProcessor
+
+@dataclass
+class CountingCondition(Condition):
+    calls: int = field(default=0, repr=False, compare=False)
+
+    def apply(self, df: pd.DataFrame) -> pd.Series:
+        self.calls += 1
+        return super().apply(df)
+
+def double(value):
+    return value * 2
+
+def negate(value):
+    return -value
+
+def pipeline(where: Condition) -> Pipeline:
+    return Pipeline([
+        Compute(ElementProcessor(double), NameFilter(["a"]), dest_col="a2", where=where),
+        Compute(ElementProcessor(negate), NameFilter(["a"]), dest_col="a_neg", where=where),
+        Compute(ElementProcessor(double), NameFilter(["b"]), dest_col="b2", where=where),
+    ])
+
+def test_optimize_fuses_steps_over_one_column_with_the_same_result():
+    df = pd.DataFrame({"a": [1, 2, 3], "b": [4, 5, 6], "keep": [True, False, True]})
+    optimized = optimize(pipeline(Condition("keep", "eq", True)))
+
+    assert sum(isinstance(step, FusedCompute) for step in optimized.steps) == 1
+    pd.testing.assert_frame_equal(optimized.execute(df.copy()), pipeline(Condition("keep", "eq", True)).execute(df.copy()))
+
+def test_optimize_evaluates_a_shared_predicate_once_per_execute():
+    where = CountingCondition("keep", "eq", True)
+    optimized = optimize(pipeline(where))
+    assert isinstance(optimized.steps[0], InvalidateMasks)
+
+    df = pd.DataFrame({"a": [1, 2, 3], "b": [4, 5, 6], "keep": [True, False, True]})
+    optimized.execute(df)
+    assert where.calls == 1
+
+    # same index object, other values: the mask of the previous execute must not be reused
+    other = pd.DataFrame({"a": [1, 2, 3], "b": [4, 5, 6], "keep": [False, True, False]}, index=df.index)
+    result = optimized.execute(other)
+    assert where.calls == 2
+    assert result["b2"].isna().tolist() == [True, False, True]
+    assert result.loc[1, "b2"] == 10
+
+def test_optimize_drops_steps_whose_output_is_never_read():
+    df = pd.DataFrame({"a": [1, 2, 3], "b": [4, 5, 6]})
+    chained = Pipeline([
+        Compute(ElementProcessor(double), NameFilter(["a"]), dest_col="a2"),
+        Compute(ElementProcessor(negate), NameFilter(["a2"]), dest_col="a_neg"),
+        Compute(ElementProcessor(double), NameFilter(["b"]), dest_col="b2"),
+    ])
+    optimized = optimize(chained, outputs=["a_neg"])
+
+    # a2 stays as the input of a_neg, b2 is read by nobody
+    assert [step.dest_col for step in optimized.steps] == ["a2", "a_neg"]
+    result = optimized.execute(df)
+    assert "b2" not in result.columns
+    assert result["a_neg"].tolist() == [-2, -4, -6]
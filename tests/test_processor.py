@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+from dataframe.processor import ElementProcessor, RowProcessor
+
+def scale(value, factor):
+    return value * factor
+
+def row_total(row):
+    return row["a"] + row["b"]
+
+def frame(rows: int = 50) -> pd.DataFrame:
+    # an unordered index, results have to come back in frame order and not index order
+    return pd.DataFrame({"a": range(rows), "b": range(rows, 2 * rows)}, index=[f"k{(pos * 7) % rows}" for pos in range(rows)])
+
+@pytest.mark.parametrize("parallel", ["thread", "process"])
+def test_parallel_element_processor_matches_serial(parallel):
+    processor = ElementProcessor(scale, factor=3)
+    df = frame()
+    pd.testing.assert_frame_equal(processor.process_parallel(df, parallel, max_workers=3), processor.process(df))
+
+@pytest.mark.parametrize("parallel", ["thread", "process"])
+def test_parallel_row_processor_matches_serial(parallel):
+    processor = RowProcessor(row_total)
+    df = frame()
+    pd.testing.assert_series_equal(processor.process_parallel(df, parallel, max_workers=3), processor.process(df))
+
+def test_parallel_processor_runs_small_frames_serially():
+    processor = ElementProcessor(scale, factor=2)
+    df = frame(1)
+    pd.testing.assert_frame_equal(processor.process_parallel(df, "process", max_workers=4), processor.process(df))
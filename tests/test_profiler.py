@@ -0,0 +1,41 @@
+import json
+import pandas as pd
+from dataframe.col_filter import NameFilter
+from dataframe.pipeline import Compute, FilterRows, Pipeline
+from dataframe.predicate import Condition
+from dataframe.processor import ElementProcessor
+from dataframe.profiler import Profiler, active_profiler
+
+def double(value):
+    return value * 2
+
+def pipeline() -> Pipeline:
+    return Pipeline([
+        FilterRows(Condition("size", "gt", 1)),
+        Compute(ElementProcessor(double), NameFilter(["size"]), dest_col="double", where=Condition("size", "lt", 4)),
+    ], name="sizes")
+
+def test_profiler_records_each_step_with_rows_and_selectivity(tmp_path):
+    df = pd.DataFrame({"size": [1, 2, 3, 4]})
+    with Profiler() as profiler:
+        assert active_profiler() is profiler
+        out = pipeline().execute(df)
+    assert active_profiler() is None
+    assert out["double"].tolist() == [4, 6, None]
+
+    records = profiler.to_frame()
+    assert records["step"].tolist() == ["FilterRows", "Compute[double->double]"]
+    assert records["pipeline"].tolist() == ["sizes", "sizes"]
+    assert records[["rows_in", "rows_out", "rows_selected"]].values.tolist() == [[4, 3, 3], [3, 3, 2]]
+    assert records["selectivity"].tolist() == [0.75, 2 / 3]
+
+    profiler.save_json(str(tmp_path / "profile.json"))
+    with open(tmp_path / "profile.json", encoding="utf-8") as f:
+        assert len(json.load(f)) == 2
+    assert [line.rsplit(" ", 1)[0] for line in profiler.folded()] == ["sizes;FilterRows", "sizes;Compute[double->double]"]
+
+def test_pipelines_run_unprofiled_without_an_active_profiler():
+    profiler = Profiler()
+    pipeline().execute(pd.DataFrame({"size": [1, 2]}))
+    assert profiler.records == []
+    assert profiler.summary() == "No steps recorded"
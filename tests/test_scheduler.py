@@ -0,0 +1,25 @@
+import threading
+from core.scheduler import IOScheduler, UNKNOWN_DEV
+
+def test_plan_groups_by_device_in_inode_order():
+    paths = ["a", "b", "c", "d", "e"]
+    queues = IOScheduler().plan(paths, devs=[1, 2, 1, 1, 2], inos=[30, 5, 10, 20, 1])
+    assert queues == {1: [2, 3, 0], 2: [4, 1]}
+
+def test_plan_stats_missing_locations_and_queues_unreadable_paths_apart(tmp_path):
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"photo")
+    queues = IOScheduler().plan([str(path), str(tmp_path / "missing.jpg")], devs=[None, None], inos=[None, None])
+    assert queues[path.stat().st_dev] == [0]
+    assert queues[UNKNOWN_DEV] == [1]
+
+def test_map_returns_results_in_input_order_and_reads_each_device_sequentially():
+    threads = {}
+    def read(path):
+        threads.setdefault(path.split("/")[0], set()).add(threading.get_ident())
+        return path.upper()
+
+    paths = [f"dev{pos % 3}/{pos}" for pos in range(12)]
+    results = IOScheduler().map(read, paths, devs=[pos % 3 for pos in range(12)], inos=list(range(12, 0, -1)))
+    assert results == [path.upper() for path in paths]
+    assert all(len(idents) == 1 for idents in threads.values())
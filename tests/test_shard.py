@@ -0,0 +1,67 @@
+import os
+import pandas as pd
+from constants import Cols
+from core.cache import JSONCache, ContentJSONCache
+from core.shard import ShardedCache, migrate_flat_cache, root_shard
+from tests.test_cache import json_io
+
+def sharded(path: str, cache_type=JSONCache) -> ShardedCache:
+    return ShardedCache(path=path, factory=lambda shard_path: cache_type(path=f"{shard_path}.json", **json_io()))
+
+def register_frame(paths: dict[str, str]) -> pd.DataFrame:
+    return pd.DataFrame({Cols.FILE_PATH: paths, Cols.SIZE: dict.fromkeys(paths, 10)})
+
+def test_sharded_cache_routes_entries_and_writes_only_touched_shards(tmp_path):
+    path = str(tmp_path / "register")
+    cache = sharded(path)
+    cache.load()
+    cache.assign({"a": "dev-1", "b": "dev-2"})
+    cache.add(register_frame({"a": "D:\\a.jpg", "b": "E:\\b.jpg"}))
+    cache.save()
+    assert sorted(os.listdir(path)) == ["dev-1.json", "dev-2.json", "manifest.json"]
+
+    cache.load()
+    cache.assign({"c": "dev-2"})
+    cache.clone({"a": "c"})
+    mtime = os.stat(os.path.join(path, "dev-1.json")).st_mtime_ns
+    cache.save()
+    assert os.stat(os.path.join(path, "dev-1.json")).st_mtime_ns == mtime
+
+    reloaded = sharded(path)
+    reloaded.load()
+    assert reloaded.routes == {"a": "dev-1", "b": "dev-2", "c": "dev-2"}
+    assert reloaded.get(["c"], columns=[Cols.FILE_PATH]).loc["c", Cols.FILE_PATH] == "D:\\a.jpg"
+
+def test_sharded_cache_loads_only_selected_shards(tmp_path):
+    path = str(tmp_path / "register")
+    cache = sharded(path)
+    cache.load()
+    shard = root_shard(str(tmp_path))
+    cache.assign({"a": shard, "b": "dev-other"})
+    cache.add(register_frame({"a": str(tmp_path / "a.jpg"), "b": "E:\\b.jpg"}))
+    cache.save()
+
+    cache.select([str(tmp_path / "new" / "root")])
+    cache.load()
+    assert list(cache.shards) == [shard]
+    assert cache.get(columns=[Cols.FILE_PATH]).index.tolist() == ["a"]
+
+def test_flat_caches_move_into_shards_once(tmp_path):
+    json_io()["writer"].save_records({"a": {Cols.FILE_PATH: str(tmp_path / "a.jpg"), Cols.SIZE: 10}}, str(tmp_path / "register.json"))
+    json_io()["writer"].save_records({"a": {"EXIF:Model": "X100", Cols.FILE_PATH: str(tmp_path / "a.jpg")}}, str(tmp_path / "metadata.json"))
+    register, metadata = sharded(str(tmp_path / "shards" / "register")), sharded(str(tmp_path / "shards" / "metadata"), ContentJSONCache)
+
+    routes = migrate_flat_cache(JSONCache(path=str(tmp_path / "register.json"), **json_io()), register)
+    migrate_flat_cache(ContentJSONCache(path=str(tmp_path / "metadata.json"), **json_io()), metadata, routes, dropna=True)
+    assert routes == {"a": root_shard(str(tmp_path))}
+
+    register.load()
+    metadata.load()
+    assert register.get(["a"], columns=[Cols.SIZE]).loc["a", Cols.SIZE] == 10
+    assert metadata.get(["a"], columns=["EXIF:Model"]).loc["a", "EXIF:Model"] == "X100"
+
+    # a second run leaves the shards alone, even if the flat file changed since
+    json_io()["writer"].save_records({"b": {Cols.FILE_PATH: str(tmp_path / "b.jpg"), Cols.SIZE: 20}}, str(tmp_path / "register.json"))
+    assert migrate_flat_cache(JSONCache(path=str(tmp_path / "register.json"), **json_io()), register) == {}
+    register.load()
+    assert register.get(columns=[]).index.tolist() == ["a"]
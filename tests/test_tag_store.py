@@ -0,0 +1,27 @@
+import pytest
+from dataframe.tag_store import TagStore
+
+def test_find_items_returns_sorted_union_of_tags():
+    store = TagStore().assign_tags("b", ["date", "exif"]).assign_tags("a", "date").assign_tags("c", "gps")
+    assert store.find_items("date") == ["a", "b"]
+    assert store.find_items(["gps", "exif"]) == ["b", "c"]
+    assert store.find_items("missing") == []
+    assert store.assigned_tags == {"date", "exif", "gps"}
+
+def test_cached_views_follow_assignments_and_renames():
+    store = TagStore().assign_tags("a", "date")
+    view = store.find_items("date")
+    view.append("caller's own list")
+    assert store.find_items("date") == ["a"]
+
+    store.assign_tags("b", "date")
+    assert store.find_items("date") == ["a", "b"]
+
+    store.rename_tag("date", "created")
+    assert store.find_items("date") == [] and not store.has_tag("date")
+    assert store.find_items("created") == ["a", "b"]
+    assert store.tagged_items["a"] == {"created"}
+
+def test_rename_of_an_unknown_tag_fails():
+    with pytest.raises(ValueError):
+        TagStore().rename_tag("date", "created")
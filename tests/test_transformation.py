@@ -0,0 +1,52 @@
+import pandas as pd
+from core.transformation import DateParser, Reservoir
+
+def failed_dates(parser: DateParser) -> dict[str, int]:
+    return {date_str: count for entry in parser.get_summary().values() for date_str, count in entry["failed_dates"].items()}
+
+def test_date_parser_reuses_persisted_results(tmp_path):
+    path = str(tmp_path / "dates.json")
+    df = pd.DataFrame({"EXIF:DateTimeOriginal": ["2024:05:01 10:20:30", "2024:05:01 10:20:30", None]})
+    first = DateParser(path=path)
+    first.load()
+    expected = first.parse_frame(df)
+    first.save()
+
+    second = DateParser(path=path)
+    second.load()
+    parsed = []
+    second._parse_strs = lambda date_strs: parsed.extend(date_strs) or []
+    pd.testing.assert_frame_equal(second.parse_frame(df), expected)
+    assert parsed == []
+    assert expected.iloc[0, 0] == pd.Timestamp("2024-05-01 10:20:30").timestamp()
+    assert pd.isna(expected.iloc[2, 0])
+
+def test_date_parser_reports_failed_dates_on_every_run(tmp_path):
+    path = str(tmp_path / "dates.json")
+    df = pd.DataFrame({"EXIF:DateTimeOriginal": ["2024:13:45 10:20:30", "2024:13:45 10:20:30", "2024:05:01 10:20:30"]})
+    for _ in range(2):
+        parser = DateParser(path=path)
+        parser.load()
+        parser.parse_frame(df)
+        parser.parse("2024:13:45 10:20:30")
+        parser.save()
+        assert failed_dates(parser) == {"2024:13:45 10:20:30": 3}
+
+def test_reservoir_counts_kept_values_and_stays_bounded():
+    reservoir = Reservoir(size=2)
+    for value in ["a", "a", "b", "a"]:
+        reservoir.add(value)
+    assert reservoir.samples == {"a": 3, "b": 1}
+    for value in ["c", "d", "e"]:
+        reservoir.add(value)
+    assert len(reservoir.samples) == 2
+    assert reservoir.seen == 5
+
+def test_parse_frame_matches_parsing_each_value():
+    values = [
+        "2024:05:01 10:20:30", "2024-05-01T10:20:30Z", "2024:05:01 10:20:30+02:00", "2024:05:01 10:20:30.123",
+        "2024:05:01", "2024", "0000:00:00 00:00:00", "2024:13:45 10:20:30", "not a date", None, 2024,
+    ]
+    df = pd.DataFrame({"a": values, "b": values[::-1]})
+    expected = df.map(lambda value: DateParser().parse(value)).astype(float)
+    pd.testing.assert_frame_equal(DateParser().parse_frame(df), expected)
@@ -111,6 +111,13 @@ def is_parent(path: str, of_path: str) -> bool:
     common_path = get_common_path([path, of_path]) 
     return path == common_path and path != of_path
 
+def is_within(path: str, root: str) -> bool:
+    # lexical check, neither path has to exist
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        return False
+
 def tree_depth(path: str) -> int:
     if is_not_dir(path):
         raise NotADirectoryError(f"Provided path '{path}' is not a dir")